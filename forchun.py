@@ -1,23 +1,125 @@
+import bisect
+import os
+import time
+
 import numpy as np
 import heapq as hq
 from queue import PriorityQueue
 
 from forchun_entities import *
+from forchun_entities import _EPS
+
+class Event_Index:
+    # y of the pending events, kept sorted as the sweep goes. Site events leave in queue order so they are a
+    # suffix of one sorted array, circle events sit in sorted lists by validity
+    _site_ys : np.ndarray
+    _sites_done : int
+    _valid : list[float]
+    _invalid : list[float]
+
+    def __init__(self, site_ys : list[float], valid : list[float] = None, invalid : list[float] = None):
+        # every list sorted
+        self._site_ys = np.asarray(site_ys, dtype=np.float64)
+        self._sites_done = 0
+        self._valid = valid if valid is not None else []
+        self._invalid = invalid if invalid is not None else []
+
+    @staticmethod
+    def from_queue(queue : list):
+        return Event_Index(sorted(y for y, e in queue if e.type & 1),
+                           sorted(y for y, e in queue if not e.type & 1 and e.is_valid),
+                           sorted(y for y, e in queue if not e.type & 1 and not e.is_valid))
+
+    def add_circle(self, y : float):
+        bisect.insort(self._valid, y)
+
+    def invalidate(self, y : float):
+        del self._valid[bisect.bisect_left(self._valid, y)]
+        bisect.insort(self._invalid, y)
+
+    def pop(self, y : float, e : FEvent):
+        if e.type & 1:
+            self._sites_done += 1
+            return
+        ys = self._valid if e.is_valid else self._invalid
+        del ys[bisect.bisect_left(ys, y)]
+
+    def __len__(self):
+        return len(self._site_ys) - self._sites_done + len(self._valid) + len(self._invalid)
+
+    def site_ys(self) -> np.ndarray: return self._site_ys[self._sites_done:]
+
+    def circle_ys(self, valid : bool = True) -> list[float]: return self._valid if valid else self._invalid
+
+    def histogram(self, rows : int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # pending site, valid and invalid circle events per scanline 0..rows-1, as drawn at int(round(y))
+        edges = np.arange(rows + 1) - 0.5
+        sites = np.diff(np.searchsorted(self.site_ys(), edges))
+        valid = np.diff([bisect.bisect_left(self._valid, y) for y in edges.tolist()])
+        invalid = np.diff([bisect.bisect_left(self._invalid, y) for y in edges.tolist()])
+        return sites, valid, invalid
+
 
 class Forchun_Draw_Result:
-    site_events : list[int]
-    circle_events : list[int, bool]  # y, is_valid
+    events : Event_Index  # the live index, read it before the sweep goes on
 
     completed : list[QPolygon]
     uncompleted : list[QPolygon]
 
-    def __init__(self, site_events : list[int], circle_events : list[int, bool],
-                 completed : list[QPolygon], uncompleted : list[QPolygon]):
-        self.site_events = site_events
-        self.circle_events = circle_events
+    def __init__(self, events : Event_Index, completed : list[QPolygon], uncompleted : list[QPolygon]):
+        self.events = events
         self.completed = completed
         self.uncompleted = uncompleted
 
+    @property
+    def site_events(self) -> list[float]: return self.events.site_ys().tolist()
+
+    @property
+    def circle_events(self) -> list[tuple[float, bool]]:  # y, is_valid
+        return [(y, True) for y in self.events.circle_ys()] + [(y, False) for y in self.events.circle_ys(False)]
+
+def dedupe_sites(sites, merge_dist : float = 0.) -> tuple[list, list[int]]:
+    # hash grid with merge_dist cells: a near duplicate can only sit in the 3x3 block around its cell
+    unique = []
+    site_map = []
+
+    if merge_dist <= 0.:
+        seen = {}
+        for s in sites:
+            key = (s[0], s[1])
+            i = seen.get(key)
+            if i is None:
+                i = seen[key] = len(unique)
+                unique.append(key)
+            site_map.append(i)
+        return unique, site_map
+
+    grid = {}
+    d2 = merge_dist * merge_dist
+    for s in sites:
+        x, y = s[0], s[1]
+        cx, cy = int(np.floor(x / merge_dist)), int(np.floor(y / merge_dist))
+
+        found = -1
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for i in grid.get((gx, gy), ()):
+                    ux, uy = unique[i]
+                    if (ux - x) * (ux - x) + (uy - y) * (uy - y) <= d2:
+                        found = i
+                        break
+                if found >= 0: break
+            if found >= 0: break
+
+        if found < 0:
+            found = len(unique)
+            unique.append((x, y))
+            grid.setdefault((cx, cy), []).append(found)
+        site_map.append(found)
+
+    return unique, site_map
+
+
 class Node:
     type : int = 0  # 1 - parabola, 0b10 - edge
     id : int  # graph staff only
@@ -79,11 +181,74 @@ class Node:
 
 
 
+class Beachline_Arrays:
+    # the beachline in order as flat arrays: arc i lies between edges i - 1 and i
+    arcs : list[Node]
+    edges : list[Node]
+    site : np.ndarray  # (m, 2) arc sites
+    start : np.ndarray  # (m - 1, 2) edge starts
+    k : np.ndarray
+    b : np.ndarray
+    grow_right : np.ndarray
+
+    def __init__(self, root : Node):
+        self.arcs, self.edges = [], []
+        stack = []
+        node = root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left_node
+            node = stack.pop()
+            if node.type & 1: self.arcs.append(node)
+            else: self.edges.append(node)
+            node = node.right_node
+
+        self.site = np.array([n.par.site.pos for n in self.arcs], dtype=np.float64).reshape(-1, 2)
+        self.start = np.array([n.edge._start for n in self.edges], dtype=np.float64).reshape(-1, 2)
+        self.k = np.array([n.edge.k for n in self.edges], dtype=np.float64)
+        self.b = np.array([n.edge.b for n in self.edges], dtype=np.float64)
+        self.grow_right = np.array([n.edge.grow_right for n in self.edges], dtype=bool)
+
+    def breakpoints(self, d : float) -> tuple[np.ndarray, np.ndarray]:
+        # (m - 1, 2) crossings of every edge with the arc on its left and on its right, nan where there is none
+        left = intersect_edges_parabolas(self.start, self.k, self.b, self.grow_right, self.site[:-1], d)
+        right = intersect_edges_parabolas(self.start, self.k, self.b, self.grow_right, self.site[1:], d)
+        return left, right
+
+
 class Beachline:
     root : Node = None
-    node_counter = 0  # graph purpose only
+    node_counter = 0  # graph purpose only, also grows with every change of the tree
+
+    _flat : Beachline_Arrays = None
+    _flat_counter = -1
+    _breaks : tuple = None  # d, node counter, left and right crossings, split x per edge or None when unsorted
+
+    def flat(self) -> Beachline_Arrays:
+        if self._flat_counter != self.node_counter or self._flat is None:
+            self._flat = Beachline_Arrays(self.root)
+            self._flat_counter = self.node_counter
+        return self._flat
+
+    def breakpoints(self, d : float) -> tuple[np.ndarray, np.ndarray]:
+        # solved once per sweep position and tree, shared by drawing and get_parabola_by_x
+        if self._breaks and self._breaks[0] == d and self._breaks[1] == self.node_counter: return self._breaks[2:4]
+
+        flat = self.flat()
+        left, right = flat.breakpoints(d)
+        # the tree search splits at the left crossing, else the right one, else the edge start
+        split = np.where(np.isnan(left[:, 0]), np.where(np.isnan(right[:, 0]), flat.start[:, 0], right[:, 0]),
+                         left[:, 0])
+        if np.any(split[1:] < split[:-1]): split = None
+        self._breaks = (d, self.node_counter, left, right, split)
+        return left, right
 
     def get_parabola_by_x(self, x : int, d : int):
+        if self._breaks and self._breaks[0] == d and self._breaks[1] == self.node_counter \
+                and self._breaks[4] is not None:
+            return self._flat.arcs[int(np.searchsorted(self._breaks[4], x, side='right'))]
+
         cur_node = self.root
         while not (cur_node.type & 1):
             left = cur_node.get_left_leaf()
@@ -93,14 +258,49 @@ class Beachline:
             left_inter = parent_edge_node.get_intersection_with_parabola(left.par, d)
             right_inter = parent_edge_node.get_intersection_with_parabola(right.par, d)
 
-            if not left_inter and right_inter: inter_x = right_inter[0]
-            else: inter_x = left_inter[0]
+            if left_inter: inter_x = left_inter[0]
+            elif right_inter: inter_x = right_inter[0]
+            else: inter_x = parent_edge_node.x()  # both arcs degenerate at the edge start
 
             if x < inter_x: cur_node = cur_node.left_node
             else: cur_node = cur_node.right_node
 
         return cur_node
 
+    def arcs(self) -> list[Node]:
+        # parabola leaves from left to right
+        out = []
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left_node
+            node = stack.pop()
+            if node.type & 1: out.append(node)
+            node = node.right_node
+        return out
+
+    def build_row(self, row : list[Site], width : int):
+        # sites sharing the lowest y sorted by x: arcs are vertical rays split by vertical edges, no search needed
+
+        def _build(lo : int, hi : int):
+            if lo == hi:
+                node = Node(Parabola(row[lo]), self.node_counter)
+                self.node_counter += 1
+                return node
+
+            mid = (lo + hi) // 2
+            x = (row[mid].x() + row[mid + 1].x()) / 2
+            node = Node(Edge((x, row[mid].y() - width), np.inf, x, True), self.node_counter)
+            self.node_counter += 1
+
+            node.set_left(_build(lo, mid))
+            node.set_right(_build(mid + 1, hi))
+            return node
+
+        self.root = _build(0, len(row) - 1)
+
     def set_parent_from_node(self, from_node : Node, to_node : Node):
         if from_node.parent:
             if from_node.parent.left_node == from_node: from_node.parent.set_left(to_node)
@@ -110,16 +310,25 @@ class Beachline:
 class Forchun:
     sites : list[Site]
     _complete_edges : list[tuple[tuple[int, int], tuple[int, int]]]  # (start, finish)
+    _vertices : list[tuple[float, float, float, int, int, int]]  # x, y, circumradius, left, middle, right site
+    _pairs : list[tuple[int, int]]  # sites split by each created edge, the Delaunay edges
     _width : int
     beachline : Beachline
     # beachline : list[tuple[int, int, Parabola]]  # from x1 inclusive to x2 exclusive lays par
 
     _events_q : PriorityQueue  # y, Event
+    _events : Event_Index  # y of _events_q sorted for drawing
 
     cur_d : int = -1
+    circle_created : int = 0
+    circle_invalidated : int = 0
+
+    site_map : list[int]  # input index -> index in sites, duplicates share one site
+    _site_events : list[Site_Event]  # per site, reused between runs
+    _order : list[int]  # site ids by event order of the last run
+    checkpoints : list[tuple[int, float, int]]  # events done, write seconds, bytes
 
-    def __init__(self, sites : list[tuple[int, int]], width : int):
-        self.sites = []
+    def __init__(self, sites : list[tuple[int, int]], width : int, merge_dist : float = 0.):
         self._width = width
         self._events_q = PriorityQueue()
         # self.beachline = Beachline(self._events_q, width)
@@ -127,100 +336,248 @@ class Forchun:
         self.beachline = Beachline()
         self._states = []
         self._complete_edges = []
-
-        for s in sites:
-            s0 = Site(s)
-            self.sites.append(s0)
-            self._events_q.put((s0.y(), Site_Event(s0)))
+        self._vertices = []
+        self._pairs = []
+        self.checkpoints = []
+
+        unique, self.site_map = dedupe_sites(sites, merge_dist)
+        self.sites = [Site(s, i) for i, s in enumerate(unique)]
+        self._site_events = [Site_Event(s) for s in self.sites]
+        self._order = list(range(len(self.sites)))
+        self._fill_queue()
+
+    def reset_positions(self, positions):
+        # ordering only: new positions of the same site ids, the site objects and the previous event order are
+        # reused but the sweep starts over and costs what a new Forchun does. Warm start for animation frames is
+        # Dynamic_Diagram.move_sites
+        if isinstance(positions, np.ndarray): positions = positions.tolist()
+        if len(positions) != len(self.sites):
+            raise ValueError(f'expected {len(self.sites)} positions, got {len(positions)}')
+
+        for s, p in zip(self.sites, positions): s.pos = (p[0], p[1])
+        self._start_over()
 
     def next_step(self):
         if self._events_q.empty(): return
 
-        y, e = self._events_q.get_nowait()
+        y, e = self._pop_event()
         if e.type & 1: self._site_event(e.site)
         elif e.is_valid: self._circle_event(e)
 
         self.cur_d = y
 
+    def _pop_event(self):
+        y, e = self._events_q.get_nowait()
+        self._events.pop(y, e)
+        return y, e
+
     def next_stop_by(self, y : int):
         while y > self.cur_d:
             if self._events_q.empty() or self._events_q.queue[0][0] >= y: break
             self.next_step()
 
-    def all_steps(self):
+    def run_steps(self, count : int) -> int:
+        # at most count events, returns how many were processed
+        done = 0
+        while done < count and not self._events_q.empty():
+            y, e = self._pop_event()
+            if e.type & 1: self._site_event(e.site)
+            elif e.is_valid: self._circle_event(e)
+
+            self.cur_d = y
+            done += 1
+        return done
+
+    def all_steps(self, checkpoint_path : str = None, checkpoint_every : int = 100000):
         if self._events_q.empty(): return
 
+        steps = 0
         while not self._events_q.empty():
-            y, e = self._events_q.get_nowait()
+            y, e = self._pop_event()
             if e.type & 1: self._site_event(e.site)
             elif e.is_valid: self._circle_event(e)
 
             self.cur_d = y
 
+            steps += 1
+            if checkpoint_path and steps % checkpoint_every == 0: self.save_checkpoint(checkpoint_path, steps)
+
+    def save_checkpoint(self, path : str, steps : int = 0):
+        # flat arrays instead of the object graph; nodes in preorder, events in heap order
+        t = time.perf_counter()
+
+        nodes = []
+        node_index = {}
+        stack = [self.beachline.root] if self.beachline.root else []
+        while stack:
+            node = stack.pop()
+            node_index[node] = len(nodes)
+            nodes.append(node)
+            if node.right_node: stack.append(node.right_node)
+            if node.left_node: stack.append(node.left_node)
+
+        n = len(nodes)
+        node_type = np.empty(n, dtype=np.int8)
+        node_id = np.empty(n, dtype=np.int64)
+        node_child = np.full((n, 2), -1, dtype=np.int32)
+        node_site = np.full(n, -1, dtype=np.int32)
+        node_edge = np.full((n, 5), np.nan)  # start x, start y, k, b, grow right
+        for i, node in enumerate(nodes):
+            node_type[i] = node.type
+            node_id[i] = node.id
+            if node.left_node: node_child[i, 0] = node_index[node.left_node]
+            if node.right_node: node_child[i, 1] = node_index[node.right_node]
+            if node.type & 1: node_site[i] = node.par.site.id
+            else:
+                e = node.edge
+                node_edge[i] = e.x(), e.y(), e.k, e.b, e.grow_right
+
+        queue = self._events_q.queue
+        m = len(queue)
+        event_y = np.empty(m)
+        event_type = np.empty(m, dtype=np.int8)
+        event_ref = np.full(m, -1, dtype=np.int32)  # site index or parabola node index
+        event_point = np.full((m, 2), np.nan)
+        event_sites = np.full((m, 3), -1, dtype=np.int32)
+        for i, (y, e) in enumerate(queue):
+            event_y[i] = y
+            event_type[i] = e.type
+            if e.type & 1: event_ref[i] = e.site.id
+            else:
+                event_point[i] = e.inter_point
+                if e.sites: event_sites[i] = e.sites
+                # invalid events may point to nodes already out of the tree, they are never processed
+                if e.is_valid: event_ref[i] = node_index[e.par_node]
+
+        # completed edges hold rounded points
+        edges = np.asarray(self._complete_edges, dtype=np.int32).reshape(-1, 4)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, sites=np.asarray([s.pos for s in self.sites]).reshape(-1, 2),
+                     site_map=np.asarray(self.site_map, dtype=np.int32),
+                     scalars=np.array([self._width, self.cur_d, self.beachline.node_counter,
+                                       self.circle_created, self.circle_invalidated]),
+                     node_type=node_type, node_id=node_id, node_child=node_child, node_site=node_site,
+                     node_edge=node_edge, event_y=event_y, event_type=event_type, event_ref=event_ref,
+                     event_point=event_point, event_sites=event_sites, edges=edges,
+                     vertices=np.asarray(self._vertices, dtype=np.float64).reshape(-1, 6),
+                     pairs=np.asarray(self._pairs, dtype=np.int32).reshape(-1, 2))
+        os.replace(tmp, path)
+
+        self.checkpoints.append((steps, time.perf_counter() - t, os.path.getsize(path)))
+        return self.checkpoints[-1]
+
+    @staticmethod
+    def resume(path : str):
+        data = np.load(path)
+        f = Forchun.__new__(Forchun)
+
+        width, cur_d, node_counter, *stats = data['scalars'].tolist()
+        f._width = int(width)
+        f.cur_d = cur_d
+        # older checkpoints have no circle event stats and triples
+        f.circle_created, f.circle_invalidated = (int(v) for v in stats) if stats else (0, 0)
+        event_sites = data['event_sites'].tolist() if 'event_sites' in data.files else [None] * len(data['event_y'])
+        f._states = []
+        f.checkpoints = []
+        f.site_map = data['site_map'].tolist()
+        f.sites = [Site(tuple(s), i) for i, s in enumerate(data['sites'].tolist())]
+        f._site_events = [Site_Event(s) for s in f.sites]
+        f._order = list(range(len(f.sites)))
+        f._complete_edges = [((x1, y1), (x2, y2)) for x1, y1, x2, y2 in data['edges'].tolist()]
+        f._vertices = [(x, y, r, int(a), int(b), int(c)) for x, y, r, a, b, c in data['vertices'].tolist()]
+        # older checkpoints have no pairs
+        f._pairs = [(a, b) for a, b in data['pairs'].tolist()] if 'pairs' in data.files else []
+
+        f.beachline = Beachline()
+        f.beachline.node_counter = int(node_counter)
+        node_site = data['node_site'].tolist()
+        node_edge = data['node_edge'].tolist()
+        nodes = []
+        for i, (t, id) in enumerate(zip(data['node_type'].tolist(), data['node_id'].tolist())):
+            if t & 1: nodes.append(Node(Parabola(f.sites[node_site[i]]), id))
+            else:
+                x, y, k, b, grow_right = node_edge[i]
+                nodes.append(Node(Edge((x, y), k, b, bool(grow_right)), id))
+        for node, (left, right) in zip(nodes, data['node_child'].tolist()):
+            if left >= 0: node.set_left(nodes[left])
+            if right >= 0: node.set_right(nodes[right])
+        if nodes: f.beachline.root = nodes[0]
+
+        # heap order is kept, no re-heapify
+        f._events_q = PriorityQueue()
+        queue = f._events_q.queue
+        for y, t, ref, point, triple in zip(data['event_y'].tolist(), data['event_type'].tolist(),
+                                            data['event_ref'].tolist(), data['event_point'].tolist(), event_sites):
+            if t & 1:
+                queue.append((y, f._site_events[ref]))
+                continue
+
+            e = Circle_Event(y, tuple(point), nodes[ref] if ref >= 0 else None)
+            if triple and triple[0] >= 0: e.sites = tuple(triple)
+            if ref >= 0: nodes[ref].par.circle_event = e
+            else: e.is_valid = False
+            queue.append((y, e))
+        f._events = Event_Index.from_queue(queue)
+
+        return f
+
+    def adjacency(self) -> tuple[np.ndarray, np.ndarray]:
+        # CSR (indptr, indices) over self.sites of the site pairs split by an edge so far, both directions
+        n = len(self.sites)
+        pairs = np.asarray(self._pairs, dtype=np.int64).reshape(-1, 2)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+
+        keys = np.unique(np.concatenate((pairs[:, 0] * n + pairs[:, 1], pairs[:, 1] * n + pairs[:, 0])))
+        rows, indices = np.divmod(keys, n)
+        indptr = np.searchsorted(rows, np.arange(n + 1))
+        return indptr, indices
+
+    def vertex_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Voronoi vertices so far: (m, 2) centers, (m,) circumradii, (m, 3) left, middle, right site ids
+        v = np.asarray(self._vertices, dtype=np.float64).reshape(-1, 6)
+        return v[:, :2], v[:, 2], v[:, 3:].astype(np.int64)
+
     def draw(self, d : int):
-        site_events = []
-        circle_events = []
         completed = []
         uncompleted = []
 
-        for ey, e in self._events_q.queue:
-            if e.type & 1: site_events.append(ey)
-            else: circle_events.append((ey, e.is_valid))
-
-        def _dive(node : Node):
-            min_x, max_x = 0., self._width
+        if self.beachline.root:
+            flat = self.beachline.flat()
+            left, right = self.beachline.breakpoints(d)
 
-            if node.type & 1:
+            for i, node in enumerate(flat.arcs):
                 par = node.par
-                # print(d)
                 if d == par.y():
                     uncompleted.append(par.get_points(d, None))
-                else:
-                    left_parent_node = node.get_left_parent_edge()
-                    right_parent_node = node.get_right_parent_edge()
-
-                    if left_parent_node:
-                        inter = left_parent_node.edge.get_intersection_with_parabola(par, d)
-                        if inter: min_x = np.clip(inter[0], 0, self._width)
-
-                    if right_parent_node:
-                        inter = right_parent_node.edge.get_intersection_with_parabola(par, d)
-                        if inter: max_x = np.clip(inter[0], 0, self._width)
+                    continue
 
-                    uncompleted.append(par.get_points(d, range(int(min_x), int(max_x))))
+                # between the right crossing of the edge before and the left crossing of the edge after
+                min_x, max_x = 0., self._width
+                if i > 0 and not np.isnan(right[i - 1, 0]): min_x = np.clip(right[i - 1, 0], 0, self._width)
+                if i < len(flat.edges) and not np.isnan(left[i, 0]): max_x = np.clip(left[i, 0], 0, self._width)
+                uncompleted.append(par.get_points(d, range(int(min_x), int(max_x))))
 
-            else:
-                left_par = node.get_left_leaf()
-                right_par = node.get_right_leaf()
+            for j, node in enumerate(flat.edges):
                 edge = node.edge
+                min_x, max_x = 0., self._width
                 max_y = edge.y()
 
-                if left_par:
-                    inter = edge.get_intersection_with_parabola(left_par.par, d)
-                    if inter: min_x = inter[0]
-
-                if right_par:
-                    inter = edge.get_intersection_with_parabola(right_par.par, d)
-                    if inter: max_x, max_y = inter[0], max(max_y, inter[1])
+                if not np.isnan(left[j, 0]): min_x = left[j, 0]
+                if not np.isnan(right[j, 0]): max_x, max_y = right[j, 0], max(max_y, right[j, 1])
 
                 if edge.grow_right:
                     uncompleted.append(edge.get_points(int(np.round(edge.x())), int(np.round(max_x)), max_y, self._width))
                 else:
                     uncompleted.append(edge.get_points(int(np.round(min_x)), int(np.round(edge.x())), max_y, self._width))
 
-            if node.left_node: _dive(node.left_node)
-            if node.right_node: _dive(node.right_node)
-
-
-        if self.beachline.root: _dive(self.beachline.root)
-
         for e in self._complete_edges:
             p = QPolygon()
             p.append(QPoint(e[0][0], e[0][1]))
             p.append(QPoint(e[1][0], e[1][1]))
             completed.append(p)
 
-        return Forchun_Draw_Result(site_events, circle_events, completed, uncompleted)
+        return Forchun_Draw_Result(self._events, completed, uncompleted)
 
     def draw_current(self):
         return self.draw(self.cur_d)
@@ -242,34 +599,41 @@ class Forchun:
         self.beachline = Beachline()
         self._states = []
         self._complete_edges = []
-        self._events_q = PriorityQueue()
+        self._vertices = []
+        self._pairs = []
+        self.circle_created = self.circle_invalidated = 0
+        self._fill_queue()
+
+    def _fill_queue(self):
+        # after small moves the previous order is nearly sorted and timsort takes it in about linear time.
+        # Ties go as in FEvent.__lt__, larger x first, so the sorted list already is a valid heap
+        sites = self.sites
+        self._order.sort(key=lambda i: (sites[i].pos[1], -sites[i].pos[0]))
+
+        queue = []
+        ys = []
+        prev = None
+        for i in self._order:
+            pos = sites[i].pos
+            if pos == prev: continue  # moved onto another site, shares its cell until they part
+            prev = pos
+            queue.append((pos[1], self._site_events[i]))
+            ys.append(pos[1])
 
-        for s in self.sites: self._events_q.put((s.y(), Site_Event(s)))
+        self._events_q = PriorityQueue()
+        self._events_q.queue = queue
+        self._events = Event_Index(ys)
 
     def _site_event(self, site : Site):
+        # only the first row is built at once, equal-y sites later on search their arc one by one
         if not self.beachline.root:
-            self.beachline.root = Node(Parabola(site), self.beachline.node_counter)
-            self.beachline.node_counter += 1
-
+            row = [site]
             while not self._events_q.empty() and self._events_q.queue[0][0] == site.y():
-                _, e = self._events_q.get_nowait()
-                new_par_node = Node(Parabola(e.site), self.beachline.node_counter)
-                self.beachline.node_counter += 1
-
-                par_node = self.beachline.get_parabola_by_x(e.site.x(), site.y())
-                par = par_node.par
-                edge_start = ((e.site.x() + par.x()) / 2, e.site.y() - self._width)
-                new_edge_node = Node(Edge(edge_start, np.inf, edge_start[0], True), 1)
-                self.beachline.node_counter += 1
-
-                self.beachline.set_parent_from_node(par_node, new_edge_node)
-                if e.site.x() < par.x():
-                    new_edge_node.set_left(new_par_node)
-                    new_edge_node.set_right(par_node)
-                else:
-                    new_edge_node.set_left(par_node)
-                    new_edge_node.set_right(new_par_node)
+                row.append(self._pop_event()[1].site)
 
+            row.sort(key=lambda s: s.x())
+            self.beachline.build_row(row, self._width)
+            self._pairs.extend((a.id, b.id) for a, b in zip(row, row[1:]))
             return
 
         replace_par_node = self.beachline.get_parabola_by_x(site.x(), site.y())
@@ -290,6 +654,7 @@ class Forchun:
         repl_par_right_node = Node(Parabola(repl_par.site), self.beachline.node_counter + 1)
         new_par_node = Node(Parabola(site), self.beachline.node_counter + 2)
         self.beachline.node_counter += 3
+        self._pairs.append((repl_par.site.id, site.id))
 
         self.beachline.set_parent_from_node(replace_par_node, edge_left_node)
 
@@ -299,34 +664,70 @@ class Forchun:
         edge_right_node.set_left(new_par_node)
         edge_right_node.set_right(repl_par_right_node)
 
-        if repl_par.circle_event: repl_par.circle_event.is_valid = False
+        self._drop_circle_event(repl_par)
 
-        self._add_circle_event(repl_par_left_node)
-        self._add_circle_event(repl_par_right_node)
+        self._add_circle_event(repl_par_left_node, site.y())
+        self._add_circle_event(repl_par_right_node, site.y())
 
 
-    def _add_circle_event(self, par_node : Node):
+    def _add_circle_event(self, par_node : Node, d : float):
+        # d is the sweep position; events above it were already passed
         par = par_node.par
 
         left_edge_node = par_node.get_left_parent_edge()
         right_edge_node = par_node.get_right_parent_edge()
+        if not left_edge_node or not right_edge_node:
+            self._drop_circle_event(par)
+            return
 
-        if not left_edge_node or not right_edge_node: return
+        a, b, c = left_edge_node.get_left_leaf().par.site, par.site, right_edge_node.get_right_leaf().par.site
 
-        inter = left_edge_node.edge.get_intersection_with_edge(right_edge_node.edge)
-        if not inter: return
+        # the breakpoints converge only when a, b, c turn clockwise in y down coordinates,
+        # collinear and a == c (an arc split by a site) never do. Exact on integer sites
+        bx, by = b.x() - a.x(), b.y() - a.y()
+        cx, cy = c.x() - a.x(), c.y() - a.y()
+        cross = bx * cy - by * cx
+        if cross <= 0:
+            self._drop_circle_event(par)
+            return
 
-        offset_x, offset_y = par.x() - inter[0], par.y() - inter[1]
-        event_y = int(np.round(inter[1] + np.sqrt(offset_x * offset_x + offset_y * offset_y)))
+        # circumcenter relative to a
+        b2, c2 = bx * bx + by * by, cx * cx + cy * cy
+        ux = (cy * b2 - by * c2) / (2. * cross)
+        uy = (bx * c2 - cx * b2) / (2. * cross)
+        event_y = a.y() + uy + np.sqrt(ux * ux + uy * uy)
+        if event_y < d - _EPS * (1. + abs(d)):
+            self._drop_circle_event(par)
+            return
 
-        if par.circle_event:
-            # if par.circle_event.d >= event_y: return
-            # if par.circle_event.d < event_y: return
-            par.circle_event.is_valid = False
+        # a neighbour of the arc went away at a vertex the new neighbour shares (cocircular sites, grids):
+        # the queued event is the same circle, keep it
+        center = (a.x() + ux, a.y() + uy)
+        old = par.circle_event
+        tol = _EPS * (1. + abs(event_y))
+        if old and abs(old.d - event_y) <= tol and abs(old.x() - center[0]) <= tol and abs(old.y() - center[1]) <= tol:
+            old.sites = (a.id, b.id, c.id)
+            return
+        self._drop_circle_event(par)
 
-        e = Circle_Event(event_y, inter, par_node)
+        e = Circle_Event(event_y, center, par_node)
+        e.sites = (a.id, b.id, c.id)
         self._events_q.put((e.d, e))
+        self._events.add_circle(e.d)
         par.circle_event = e
+        self.circle_created += 1
+
+    def _drop_circle_event(self, par : Parabola):
+        # neighbours changed, the old event is stale even if no new one appears (collinear rows)
+        if not par.circle_event: return
+        self._events.invalidate(par.circle_event.d)
+        par.circle_event.is_valid = False
+        par.circle_event = None
+        self.circle_invalidated += 1
+
+    def circle_event_stats(self) -> tuple[int, int]:
+        # created and invalidated circle events so far, the rest is processed or still queued
+        return self.circle_created, self.circle_invalidated
 
 
     def _circle_event(self, e : Circle_Event):
@@ -339,6 +740,11 @@ class Forchun:
         self._complete_edges.append((left_edge_node.edge.point_int(), e.point_int()))
         self._complete_edges.append((e.point_int(), right_edge_node.edge.point_int()))
 
+        mid = e.par_node.par
+        # the event sits one circumradius below the vertex
+        self._vertices.append((e.x(), e.y(), float(e.d - e.y()),
+                               left_par_node.par.site.id, mid.site.id, right_par_node.par.site.id))
+
         try:
             k = (right_par_node.par.x() - left_par_node.par.x()) / (left_par_node.par.y() - right_par_node.par.y())
             b = e.inter_point[1] - k * e.inter_point[0]
@@ -346,10 +752,11 @@ class Forchun:
             k = np.inf
             b = e.inter_point[0]
 
-        new_edge = Edge(e.inter_point, k, b, left_edge_node.edge.grow_right if
-        left_edge_node.edge.grow_right == right_edge_node.edge.grow_right else k >= 0)
+        # the narrower arc, of the site nearer the sweep, lies between the two breakpoints
+        new_edge = Edge(e.inter_point, k, b, left_par_node.par.y() > right_par_node.par.y())
         new_edge_node = Node(new_edge, self.beachline.node_counter)
         self.beachline.node_counter += 1
+        self._pairs.append((left_par_node.par.site.id, right_par_node.par.site.id))
 
         high_edge : Node = None
         node = e.par_node
@@ -369,7 +776,7 @@ class Forchun:
 
         self.beachline.set_parent_from_node(parent, remain_node)
 
-        if e.par_node.par.circle_event: e.par_node.par.circle_event.is_valid = False
-        self._add_circle_event(left_par_node)
-        self._add_circle_event(right_par_node)
+        mid.circle_event = None
+        self._add_circle_event(left_par_node, e.d)
+        self._add_circle_event(right_par_node, e.d)
 
@@ -0,0 +1,221 @@
+import argparse
+import gc
+import time
+
+import numpy as np
+
+from forchun import Forchun
+from forchun_dynamic import Dynamic_Diagram
+from forchun_graph import euclidean_mst, nearest_neighbors, site_graph
+from forchun_index import Site_Grid
+from forchun_roi import compute_roi
+import site_generator
+
+
+def grid(n : int, width : int, height : int, rng : np.random.Generator):
+    side = max(int(np.sqrt(n)), 1)
+    xs = np.linspace(0, width - 1, side).astype(int)
+    ys = np.linspace(0, height - 1, side).astype(int)
+    gx, gy = np.meshgrid(xs, ys)
+    return np.column_stack((gx.ravel(), gy.ravel()))
+
+def grid_dup(n : int, width : int, height : int, rng : np.random.Generator):
+    # every grid site twice and shuffled
+    sites = np.concatenate([grid(n // 2, width, height, rng)] * 2)
+    return sites[rng.permutation(len(sites))]
+
+def rows(n : int, width : int, height : int, rng : np.random.Generator):
+    # few distinct y values, long equal-y runs
+    return np.column_stack((rng.integers(0, width, n), rng.integers(0, 16, n) * (height // 16)))
+
+
+WORKLOADS = {
+    **{kind: None for kind in site_generator.DISTRIBUTIONS},
+    'grid': grid,
+    'grid_dup': grid_dup,
+    'rows': rows,
+}
+
+def workload(name : str, n : int, width : int, height : int, seed : int) -> list:
+    if WORKLOADS[name] is None: a = site_generator.generate(name, n, width, height, seed)
+    else: a = WORKLOADS[name](n, width, height, np.random.default_rng(seed))
+    return a.tolist()
+
+
+def run_sweep(sites, width : int, checkpoint_path : str = None, checkpoint_every : int = 100000):
+    t = time.perf_counter()
+    f = Forchun(sites, width)
+    t_init = time.perf_counter() - t
+
+    t = time.perf_counter()
+    f.all_steps(checkpoint_path, checkpoint_every)
+    return t_init, time.perf_counter() - t, f
+
+
+def run_frames(sites, width : int, motion : float, frames : int, seed : int):
+    # mean ms of whole frames, sites jitter by motion sigma: a fresh Forchun, the warm start
+    # Dynamic_Diagram.move_sites and Forchun.reset_positions; also how many warm frames swept again
+    rng = np.random.default_rng(seed)
+    pos = np.asarray(sites, dtype=np.float64)
+    f = Forchun(pos.tolist(), width)
+    f.all_steps()
+    g = Forchun(pos.tolist(), width)
+    g.all_steps()
+    d = Dynamic_Diagram.from_forchun(g)
+
+    # all include freeing the previous frame, collections are kept out of the timings
+    fresh, warm, reset = [], [], []
+    rebuilt = 0
+    for _ in range(frames):
+        pos += rng.normal(0., motion, pos.shape)
+        gc.collect()
+        t = time.perf_counter()
+        g = Forchun(pos.tolist(), width)
+        g.all_steps()
+        fresh.append(time.perf_counter() - t)
+
+        gc.collect()
+        t = time.perf_counter()
+        rebuilt += d.move_sites(pos)
+        warm.append(time.perf_counter() - t)
+
+        gc.collect()
+        t = time.perf_counter()
+        f.reset_positions(pos)
+        f.all_steps()
+        reset.append(time.perf_counter() - t)
+
+    return np.mean(fresh), np.mean(warm), np.mean(reset), rebuilt
+
+
+def brute_nearest_neighbors(pts : np.ndarray, chunk : int = 1024):
+    nn = np.empty(len(pts), dtype=np.int64)
+    dist = np.empty(len(pts))
+    for i in range(0, len(pts), chunk):
+        d = np.hypot(pts[i:i + chunk, None, 0] - pts[None, :, 0], pts[i:i + chunk, None, 1] - pts[None, :, 1])
+        d[np.arange(len(d)), np.arange(i, i + len(d))] = np.inf
+        nn[i:i + chunk] = d.argmin(axis=1)
+        dist[i:i + chunk] = d[np.arange(len(d)), nn[i:i + chunk]]
+    return nn, dist
+
+def brute_mst_length(pts : np.ndarray):
+    # dense Prim
+    n = len(pts)
+    if n < 2: return 0.
+    best = np.hypot(pts[:, 0] - pts[0, 0], pts[:, 1] - pts[0, 1])
+    done = np.zeros(n, dtype=bool)
+    done[0] = True
+    best[0] = np.inf
+    total = 0.
+    for _ in range(n - 1):
+        j = best.argmin()
+        total += best[j]
+        done[j] = True
+        best = np.minimum(best, np.hypot(pts[:, 0] - pts[j, 0], pts[:, 1] - pts[j, 1]))
+        best[done] = np.inf
+    return total
+
+def run_graph(f : Forchun):
+    # adjacency, nearest neighbours and MST from a swept diagram against the O(n^2) references
+    t = time.perf_counter()
+    pts, indptr, indices = site_graph(f)
+    nn, dist = nearest_neighbors(pts, indptr, indices)
+    _, length = euclidean_mst(pts, indptr, indices)
+    t_graph = time.perf_counter() - t
+
+    t = time.perf_counter()
+    _, brute_dist = brute_nearest_neighbors(pts)
+    brute_length = brute_mst_length(pts)
+    t_brute = time.perf_counter() - t
+
+    wrong = int(np.count_nonzero(~np.isclose(dist, brute_dist)))
+    return t_graph, t_brute, wrong, length - brute_length
+
+
+def run_edits(f : Forchun, edits : int, width : int, height : int, seed : int):
+    # median ms of a local insert and remove on the swept diagram
+    rng = np.random.default_rng(seed)
+    d = Dynamic_Diagram.from_forchun(f)
+
+    inserts, removes = [], []
+    for _ in range(edits):
+        pos = tuple(int(v) for v in rng.integers(0, (width, height)))
+        t = time.perf_counter()
+        s = d.insert_site(pos).site
+        inserts.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        d.remove_site(s)
+        removes.append(time.perf_counter() - t)
+
+    return np.median(inserts), np.median(removes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fortune sweep benchmarks')
+    parser.add_argument('-w', '--workload', choices=list(WORKLOADS), nargs='*', default=list(WORKLOADS))
+    parser.add_argument('-n', type=int, nargs='*', default=[100, 1000, 10000])
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint', default=None, help='checkpoint file, reports write time and size')
+    parser.add_argument('--checkpoint-every', type=int, default=100000, help='events between checkpoints')
+    parser.add_argument('--roi', type=float, default=None, help='also time compute_roi on a centered window '
+                                                               'of this part of the width and height')
+    parser.add_argument('--motion', type=float, default=None, help='also time warm start frames with sites '
+                                                                   'moving by this sigma')
+    parser.add_argument('--frames', type=int, default=5)
+    parser.add_argument('--edits', type=int, default=0, help='also time this many local site inserts and removes')
+    parser.add_argument('--graph', action='store_true', help='also time nearest neighbours and MST from the '
+                                                             'diagram against brute force')
+    args = parser.parse_args()
+
+    print(f'{"workload":<14} {"n":>8} {"unique":>8} {"init ms":>10} {"sweep ms":>10} {"edges":>8} '
+          f'{"circles":>8} {"invalid %":>9}')
+    for name in args.workload:
+        for n in args.n:
+            sites = workload(name, n, args.width, args.height, args.seed)
+
+            best = None
+            for _ in range(args.repeat):
+                t_init, t_sweep, f = run_sweep(sites, args.width, args.checkpoint, args.checkpoint_every)
+                if best is None or t_init + t_sweep < sum(best): best = (t_init, t_sweep)
+
+            created, invalidated = f.circle_event_stats()
+            print(f'{name:<14} {len(sites):>8} {len(f.sites):>8} {best[0] * 1e3:>10.1f} {best[1] * 1e3:>10.1f} '
+                  f'{len(f._complete_edges):>8} {created:>8} {100. * invalidated / max(created, 1):>9.1f}')
+
+            if args.roi:
+                w, h = args.width * args.roi / 2, args.height * args.roi / 2
+                rect = (args.width / 2 - w, args.height / 2 - h, args.width / 2 + w, args.height / 2 + h)
+                index = Site_Grid(np.asarray(sites))
+                t = time.perf_counter()
+                r = compute_roi(sites, rect, args.width, index=index)
+                print(f'{"":<14} roi {len(r.sites)} sites, swept {r.swept} in {r.rounds} rounds, '
+                      f'{(time.perf_counter() - t) * 1e3:.1f} ms')
+
+            if args.edits:
+                t_insert, t_remove = run_edits(f, args.edits, args.width, args.height, args.seed)
+                print(f'{"":<14} insert ms {t_insert * 1e3:.3f}, remove ms {t_remove * 1e3:.3f}, '
+                      f'full sweep ms {best[1] * 1e3:.1f}')
+
+            if args.graph:
+                t_graph, t_brute, wrong, diff = run_graph(f)
+                print(f'{"":<14} graph ms {t_graph * 1e3:.1f}, brute force ms {t_brute * 1e3:.1f}, '
+                      f'wrong nearest {wrong}, mst length diff {diff:.3g}')
+
+            if args.motion:
+                fresh, warm, reset, rebuilt = run_frames([s.pos for s in f.sites], args.width, args.motion,
+                                                         args.frames, args.seed)
+                print(f'{"":<14} frame ms fresh {fresh * 1e3:.1f}, warm {warm * 1e3:.1f} '
+                      f'({rebuilt} of {args.frames} swept again), reset_positions {reset * 1e3:.1f}')
+
+            if f.checkpoints:
+                write = [c[1] for c in f.checkpoints]
+                print(f'{"":<14} checkpoints {len(write)}, write ms mean {np.mean(write) * 1e3:.1f} '
+                      f'max {np.max(write) * 1e3:.1f}, last {f.checkpoints[-1][2] / 1024:.0f} KiB')
+
+
+if __name__ == "__main__":
+    main()
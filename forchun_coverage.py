@@ -0,0 +1,91 @@
+import numpy as np
+
+from forchun import Forchun
+from forchun_graph import locate, site_graph
+from forchun_index import Site_Grid
+
+
+def contains(polygon, pts) -> np.ndarray:
+    # even-odd rule, points on the boundary may fall either way
+    poly = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    x, y = pts[:, 0], pts[:, 1]
+    inside = np.zeros(len(pts), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(poly.tolist(), np.roll(poly, -1, axis=0).tolist()):
+        if y1 == y2: continue
+        crosses = (y1 > y) != (y2 > y)
+        inside ^= crosses & (x < x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+    return inside
+
+
+def _candidates(f : Forchun, polygon) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # points of the clipped diagram where the distance to the owning site can peak: Voronoi vertices inside
+    # the polygon, crossings of Voronoi edges with its boundary and its corners.
+    # (points, owner site, distance), a point owned by several sites repeats once per site
+    if not f._events_q.empty(): f.all_steps()
+    poly = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+    pts, indptr, indices = site_graph(f)
+    xy, r, tri = f.vertex_arrays()
+
+    inside = contains(poly, xy)
+    points = [np.repeat(xy[inside], 3, axis=0)]
+    owners = [tri[inside].ravel()]
+    dists = [np.repeat(r[inside], 3)]
+    if not len(pts): return np.empty((0, 2)), np.empty(0, dtype=np.int64), np.empty(0)
+
+    grid = Site_Grid(pts)
+    reps = grid.representatives()
+    owner, dist = locate(pts, indptr, indices, poly, reps[grid.cell_of(poly)])
+    points.append(poly)
+    owners.append(owner)
+    dists.append(dist)
+
+    # a cell lies within its farthest vertex, open cells reach out without bound. A closed cell has as many
+    # vertices as Delaunay neighbours, an open one fewer
+    reach = np.zeros(len(pts))
+    np.maximum.at(reach, tri.ravel(), np.repeat(r, 3))
+    reach[np.bincount(tri.ravel(), minlength=len(pts)) < np.diff(indptr)] = np.inf
+
+    rows = np.repeat(np.arange(len(pts)), np.diff(indptr))
+    keep = rows < indices
+    a, b = rows[keep], indices[keep]
+    mid = (pts[a] + pts[b]) / 2.
+    d = pts[b] - pts[a]
+    tol = 1e-9 * max(1., np.abs(pts).max())
+
+    for s0, s1 in zip(poly, np.roll(poly, -1, axis=0)):
+        # where the bisector of a, b meets the boundary segment
+        den = (s1 - s0) @ d.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.einsum('ij,ij->i', mid - s0, d) / den
+        hit = np.flatnonzero((den != 0) & (t >= 0) & (t <= 1))
+        q = s0 + t[hit, None] * (s1 - s0)
+        da = np.hypot(*(q - pts[a[hit]]).T)
+        near = da <= reach[a[hit]] + tol
+        hit, q, da = hit[near], q[near], da[near]
+
+        # the bisector point is on the Voronoi edge only when no other site is closer
+        _, nd = locate(pts, indptr, indices, q, reps[grid.cell_of(q)])
+        on = nd >= da - tol
+        hit, q, da = hit[on], q[on], da[on]
+        points.append(np.concatenate((q, q)))
+        owners.append(np.concatenate((a[hit], b[hit])))
+        dists.append(np.concatenate((da, da)))
+
+    return np.concatenate(points), np.concatenate(owners), np.concatenate(dists)
+
+
+def largest_empty_circle(f : Forchun, polygon) -> tuple[np.ndarray, float]:
+    # center inside the polygon and radius of the largest circle without a site inside; None, 0 without sites
+    if not len(f.sites): return None, 0.
+    points, _, dists = _candidates(f, polygon)
+    i = int(dists.argmax())
+    return points[i], float(dists[i])
+
+
+def coverage_radius(f : Forchun, polygon) -> np.ndarray:
+    # per site the farthest point of its cell clipped to the polygon, 0 for cells outside of it
+    _, owners, dists = _candidates(f, polygon)
+    out = np.zeros(len(f.sites))
+    np.maximum.at(out, owners, dists)
+    return out
@@ -0,0 +1,410 @@
+import numpy as np
+
+from forchun import Forchun
+
+_GHOST = -1  # vertex at infinity, a ghost triangle (u, v, _GHOST) lies outside hull edge v -> u
+
+
+class Edit_Result:
+    site : int  # id of the inserted or removed site
+    removed : list[tuple[tuple[float, float], tuple[float, float]]]  # Voronoi edges gone or changed
+    added : list[tuple[tuple[float, float], tuple[float, float]]]  # their replacements
+    cells : list[int]  # sites whose cells changed, the edited one included
+    rebuilt : bool  # degenerate case, the whole diagram was swept again
+
+    def __init__(self, site : int, removed : list, added : list, cells : list[int], rebuilt : bool = False):
+        self.site = site
+        self.removed = removed
+        self.added = added
+        self.cells = cells
+        self.rebuilt = rebuilt
+
+
+def _orient(a, b, c):
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+def _in_circle(a, b, c, p):
+    # > 0 when p is strictly inside the circle of the positively oriented a, b, c; exact on integer sites
+    adx, ady = a[0] - p[0], a[1] - p[1]
+    bdx, bdy = b[0] - p[0], b[1] - p[1]
+    cdx, cdy = c[0] - p[0], c[1] - p[1]
+    return (adx * adx + ady * ady) * (bdx * cdy - cdx * bdy) + (bdx * bdx + bdy * bdy) * (cdx * ady - adx * cdy) + \
+           (cdx * cdx + cdy * cdy) * (adx * bdy - bdx * ady)
+
+def _ghost_last(a : int, b : int, c : int):
+    return (b, c, a) if a == _GHOST else (c, a, b) if b == _GHOST else (a, b, c)
+
+def _circumcenter(a, b, c):
+    bx, by = b[0] - a[0], b[1] - a[1]
+    cx, cy = c[0] - a[0], c[1] - a[1]
+    d = 2. * (bx * cy - by * cx)
+    b2, c2 = bx * bx + by * by, cx * cx + cy * cy
+    return a[0] + (cy * b2 - by * c2) / d, a[1] + (bx * c2 - cx * b2) / d
+
+
+class Dynamic_Diagram:
+    # Delaunay triangulation of a finished sweep with ghost triangles on the hull; the Voronoi diagram is its dual.
+    # insert_site re-triangulates the Bowyer-Watson cavity, remove_site re-sweeps the neighbours of the site
+    _pts : list  # site id -> (x, y), None when removed
+    _tris : dict  # triangle id -> (a, b, c), positively oriented; ghosts hold _GHOST last
+    _centers : dict  # real triangle id -> circumcenter
+    _edge_tri : dict  # directed edge (a, b) -> triangle holding it
+    _site_tri : dict  # site id -> some triangle around it
+    _next_tri : int
+    _last : int  # walks start at the last touched triangle
+    _width : int
+    _far : float  # length of drawn rays
+
+    def __init__(self, sites, width : int):
+        f = Forchun(sites, width)
+        f.all_steps()
+        self._init_from(f)
+
+    @staticmethod
+    def from_forchun(f : Forchun):
+        # f has to be swept to the end
+        d = Dynamic_Diagram.__new__(Dynamic_Diagram)
+        d._init_from(f)
+        return d
+
+    def _init_from(self, f : Forchun):
+        self._width = f._width
+        self._far = 4. * f._width
+        self._pts = [s.pos for s in f.sites]
+        self._build([tuple(v[3:]) for v in f._vertices])
+
+    def _build(self, triples : list):
+        self._tris, self._centers, self._edge_tri, self._site_tri = {}, {}, {}, {}
+        self._next_tri = 0
+        self._last = -1
+
+        pts = self._pts
+        for a, b, c in triples:
+            o = _orient(pts[a], pts[b], pts[c])
+            if o == 0: continue
+            if o < 0: b, c = c, b
+            self._add(a, b, c)
+
+        # every directed edge without a twin is on the hull
+        for a, b in [e for e in self._edge_tri if (e[1], e[0]) not in self._edge_tri]:
+            self._add(b, a, _GHOST)
+
+    def _add(self, a : int, b : int, c : int):
+        t = self._next_tri
+        self._next_tri += 1
+        self._tris[t] = (a, b, c)
+        self._edge_tri[(a, b)] = self._edge_tri[(b, c)] = self._edge_tri[(c, a)] = t
+        for v in (a, b, c):
+            if v != _GHOST: self._site_tri[v] = t
+        if c != _GHOST:
+            self._centers[t] = _circumcenter(self._pts[a], self._pts[b], self._pts[c])
+            self._last = t
+        return t
+
+    def _remove(self, t : int):
+        a, b, c = self._tris.pop(t)
+        for e in ((a, b), (b, c), (c, a)):
+            if self._edge_tri.get(e) == t: del self._edge_tri[e]
+        self._centers.pop(t, None)
+
+    def sites(self) -> list:
+        return self._pts
+
+    def triangles(self) -> np.ndarray:
+        return np.asarray([v for v in self._tris.values() if v[2] != _GHOST], dtype=np.int64).reshape(-1, 3)
+
+    def _dual(self, a : int, b : int):
+        # Voronoi edge between sites a and b, rays are cut at _far
+        t1, t2 = self._edge_tri.get((a, b)), self._edge_tri.get((b, a))
+        c1, c2 = self._centers.get(t1), self._centers.get(t2)
+        if c1 and c2: return c1, c2
+        if not c1 and not c2: return None
+
+        # ray away from the hull edge: the ghost side of a -> b is to the right
+        c = c1 or c2
+        pa, pb = self._pts[a], self._pts[b]
+        dx, dy = pb[0] - pa[0], pb[1] - pa[1]
+        if not c1: dx, dy = -dx, -dy
+        l = self._far / max(np.hypot(dx, dy), 1e-12)
+        return c, (c[0] + dy * l, c[1] - dx * l)
+
+    def _duals(self, tris : list[tuple[int, int, int]]) -> list:
+        out = []
+        seen = set()
+        for tri in tris:
+            for a, b in ((tri[0], tri[1]), (tri[1], tri[2]), (tri[2], tri[0])):
+                if a == _GHOST or b == _GHOST or (b, a) in seen: continue
+                seen.add((a, b))
+                e = self._dual(a, b)
+                if e: out.append(e)
+        return out
+
+    def edges(self) -> list:
+        # every Voronoi edge as a segment
+        if not self._centers: return self._line_edges()
+        return self._duals(list(self._tris.values()))
+
+    def _line_edges(self) -> list:
+        # no triangle, the sites lie on one line: the bisectors of neighbours along it, cut at _far both ways
+        pts = sorted(set(p for p in self._pts if p is not None))
+        out = []
+        for a, b in zip(pts, pts[1:]):
+            dx, dy = b[0] - a[0], b[1] - a[1]
+            l = self._far / np.hypot(dx, dy)
+            mx, my = (a[0] + b[0]) / 2., (a[1] + b[1]) / 2.
+            out.append(((mx + dy * l, my - dx * l), (mx - dy * l, my + dx * l)))
+        return out
+
+    def _conflicts(self, t : int, p) -> bool:
+        a, b, c = self._tris[t]
+        pts = self._pts
+        if c != _GHOST: return _in_circle(pts[a], pts[b], pts[c], p) > 0
+
+        # outside hull edge b -> a, or on its open segment
+        o = _orient(pts[a], pts[b], p)
+        if o != 0: return o > 0
+        pa, pb = pts[a], pts[b]
+        return min(pa[0], pb[0]) <= p[0] <= max(pa[0], pb[0]) and min(pa[1], pb[1]) <= p[1] <= max(pa[1], pb[1])
+
+    def _locate(self, p) -> int:
+        # visibility walk, ends in the real triangle holding p or in the ghost p is behind
+        t = self._last if self._last in self._tris else next(iter(self._centers))
+        pts = self._pts
+        for _ in range(len(self._tris) + 1):
+            a, b, c = self._tris[t]
+            if c == _GHOST: return t
+            for u, v in ((a, b), (b, c), (c, a)):
+                if _orient(pts[u], pts[v], p) < 0:
+                    t = self._edge_tri[(v, u)]
+                    break
+            else: return t
+        raise RuntimeError('point location did not converge')
+
+    def nearest_site(self, pos) -> int:
+        # greedy walk over Delaunay neighbours from the triangle holding pos
+        if not self._centers: return self._nearest_brute(pos)
+        t = self._locate(pos)
+        s = min((v for v in self._tris[t] if v != _GHOST), key=lambda v: self._dist2(v, pos))
+        while True:
+            best = min(self._neighbours(s), key=lambda v: self._dist2(v, pos), default=s)
+            if self._dist2(best, pos) >= self._dist2(s, pos): return s
+            s = best
+
+    def _nearest_brute(self, pos) -> int:
+        ids = [i for i, p in enumerate(self._pts) if p is not None]
+        return min(ids, key=lambda v: self._dist2(v, pos)) if ids else -1
+
+    def _dist2(self, v : int, pos):
+        p = self._pts[v]
+        return (p[0] - pos[0]) * (p[0] - pos[0]) + (p[1] - pos[1]) * (p[1] - pos[1])
+
+    def _star(self, s : int) -> list[int]:
+        # triangles around s in order, the next one shares the edge (s, third vertex)
+        first = t = self._site_tri[s]
+        out = []
+        while True:
+            out.append(t)
+            a, b, c = self._tris[t]
+            nxt = c if a == s else a if b == s else b
+            t = self._edge_tri[(s, nxt)]
+            if t == first: return out
+
+    def _neighbours(self, s : int) -> list[int]:
+        out = []
+        for t in self._star(s):
+            a, b, c = self._tris[t]
+            v = b if a == s else c if b == s else a
+            if v != _GHOST: out.append(v)
+        return out
+
+    def insert_site(self, pos) -> Edit_Result:
+        pos = (pos[0], pos[1])
+        if len(self._centers) == 0: return self._rebuild(self._pts + [pos], len(self._pts))
+        return self._insert(len(self._pts), pos)
+
+    def _insert(self, s : int, pos) -> Edit_Result:
+        # s is a new id at the end or a removed one
+        start = self._locate(pos)
+        for v in self._tris[start]:
+            if v != _GHOST and self._pts[v] == pos: return Edit_Result(v, [], [], [])
+
+        # Bowyer-Watson: the triangles whose circles hold pos are connected
+        cavity = {start}
+        stack = [start]
+        while stack:
+            a, b, c = self._tris[stack.pop()]
+            for u, v in ((a, b), (b, c), (c, a)):
+                t = self._edge_tri.get((v, u))
+                if t is None or t in cavity or not self._conflicts(t, pos): continue
+                cavity.add(t)
+                stack.append(t)
+
+        old = [self._tris[t] for t in cavity]
+        removed = self._duals(old)
+        boundary = [(u, v) for a, b, c in old for u, v in ((a, b), (b, c), (c, a))
+                    if self._edge_tri.get((v, u)) not in cavity]
+
+        if s == len(self._pts): self._pts.append(pos)
+        else: self._pts[s] = pos
+        for t in cavity: self._remove(t)
+
+        new = []
+        for u, v in boundary:
+            # the cavity is star shaped around pos, ghosts keep the vertex at infinity last
+            if u == _GHOST: tri = (v, s, _GHOST)
+            elif v == _GHOST: tri = (s, u, _GHOST)
+            else: tri = (u, v, s)
+            self._add(*tri)
+            new.append(tri)
+
+        cells = list(dict.fromkeys(v for u, v in boundary if v != _GHOST))
+        return Edit_Result(s, removed, self._duals(new), cells + [s])
+
+    def remove_site(self, s : int) -> Edit_Result:
+        if self._pts[s] is None: raise ValueError(f'site {s} is removed already')
+        if s not in self._site_tri or len(self._centers) < 2:
+            pts = list(self._pts)
+            pts[s] = None
+            return self._rebuild(pts, s)
+
+        star = self._star(s)
+        old = [self._tris[t] for t in star]
+        ring = self._neighbours(s)
+        # edges of the star opposite to s, seen from the outer triangles
+        outer = [(b, a) if c == s else (c, b) if a == s else (a, c) for a, b, c in old]
+        outer = [(u, v) for u, v in outer if u != _GHOST and v != _GHOST]
+
+        # local re-sweep of the ring; its triangles inside the old star fill the hole.
+        # Ring edges stay Delaunay without s, so no triangle of the ring straddles the star border
+        pts = self._pts
+        local = Forchun([pts[v] for v in ring], self._width)
+        local.all_steps()
+        real = [(pts[a], pts[b], pts[c]) for a, b, c in old if c != _GHOST]
+
+        fill = []
+        for *_, i, j, k in local._vertices:
+            # ring sites are unique, local ids follow the ring
+            a, b, c = ring[i], ring[j], ring[k]
+            o = _orient(pts[a], pts[b], pts[c])
+            if o == 0: continue
+            if o < 0: b, c = c, b
+            g = ((pts[a][0] + pts[b][0] + pts[c][0]) / 3., (pts[a][1] + pts[b][1] + pts[c][1]) / 3.)
+            # the centroid may lie on a spoke between two old triangles
+            if any(_orient(x, y, g) >= 0 and _orient(y, z, g) >= 0 and _orient(z, x, g) >= 0 for x, y, z in real):
+                fill.append((a, b, c))
+
+        interior = all(c != _GHOST for _, _, c in old)
+        if interior and len(fill) != len(ring) - 2:
+            # cocircular neighbours the sweep split differently than the ring, start over
+            pts = list(self._pts)
+            pts[s] = None
+            return self._rebuild(pts, s)
+
+        removed = self._duals(old)
+        for t in star: self._remove(t)
+        self._pts[s] = None
+        del self._site_tri[s]
+
+        new = []
+        for tri in fill:
+            self._add(*tri)
+            new.append(tri)
+        # edges left without a twin became hull edges
+        for u, v in [(u, v) for a, b, c in new for u, v in ((a, b), (b, c), (c, a))] + outer:
+            if (u, v) in self._edge_tri and (v, u) not in self._edge_tri:
+                tri = (v, u, _GHOST)
+                self._add(*tri)
+                new.append(tri)
+
+        return Edit_Result(s, removed, self._duals(new), ring + [s])
+
+    def move_sites(self, positions) -> bool:
+        # animation frame: new positions of the same site ids, removed ids are skipped. The triangulation is
+        # kept and repaired with Lawson flips, the sites of triangles that would turn over are taken out before
+        # and inserted again after. True when the sites moved too far and the diagram was swept again
+        if isinstance(positions, np.ndarray): positions = positions.tolist()
+        if len(positions) != len(self._pts):
+            raise ValueError(f'expected {len(self._pts)} positions, got {len(positions)}')
+
+        pts = [None if old is None else (p[0], p[1]) for old, p in zip(self._pts, positions)]
+        if not self._centers: return self._moved_far(pts)
+
+        step = [0. if p is None else np.hypot(p[0] - old[0], p[1] - old[1]) for old, p in zip(self._pts, pts)]
+        out = []
+        while True:
+            # the farthest moving corner of every triangle that turns over, again until none does
+            flat = {max((a, b, c), key=step.__getitem__) for a, b, c in self._tris.values()
+                    if c != _GHOST and _orient(pts[a], pts[b], pts[c]) <= 0}
+            if not flat: break
+            if 3 * (len(out) + len(flat)) > len(self._site_tri): return self._moved_far(pts)
+            for v in flat:
+                # at the old positions, where the triangulation is valid
+                if self.remove_site(v).rebuilt: return self._moved_far(pts)
+                out.append(v)
+
+        self._pts = [None if old is None else p for old, p in zip(self._pts, pts)]
+        if not self._centers or not self._flip_all(): return self._moved_far(pts)
+
+        self._centers = {}
+        for t, (a, b, c) in self._tris.items():
+            if c == _GHOST: continue
+            if _orient(pts[a], pts[b], pts[c]) <= 0: return self._moved_far(pts)
+            self._centers[t] = _circumcenter(pts[a], pts[b], pts[c])
+
+        for v in out:
+            self._insert(v, pts[v])
+            self._pts[v] = pts[v]
+
+        # merged duplicates have no triangles, they have to land on a site again
+        for s, p in enumerate(pts):
+            if p is None or s in self._site_tri: continue
+            if all(v == _GHOST or pts[v] != p for v in self._tris[self._locate(p)]): return self._moved_far(pts)
+        return False
+
+    def _moved_far(self, pts : list) -> bool:
+        self._rebuild(pts, -1)
+        return True
+
+    def _flip_all(self) -> bool:
+        # Lawson flips until every edge is locally Delaunay and the hull is convex, False when rounding cycles
+        pts = self._pts
+        stack = [e for e in self._edge_tri if e[0] < e[1]]
+        budget = 10 * len(self._tris)
+        while stack:
+            x, y = stack.pop()
+            if x == _GHOST: x, y = y, x
+            t1, t2 = self._edge_tri.get((x, y)), self._edge_tri.get((y, x))
+            if t1 is None or t2 is None: continue
+            p = next(v for v in self._tris[t1] if v != x and v != y)
+            q = next(v for v in self._tris[t2] if v != x and v != y)
+
+            # a ghost edge flips when the hull turned reflex at x, a hull edge never does
+            if y == _GHOST: flip = _orient(pts[x], pts[q], pts[p]) > 0
+            elif p == _GHOST or q == _GHOST: continue
+            else: flip = _in_circle(pts[x], pts[y], pts[p], pts[q]) > 0
+            if not flip: continue
+
+            budget -= 1
+            if budget < 0: return False
+            # x, y, p and y, x, q become x, q, p and q, y, p
+            self._remove(t1)
+            self._remove(t2)
+            self._add(*_ghost_last(x, q, p))
+            self._add(*_ghost_last(q, y, p))
+            stack += [(x, q), (q, y), (y, p), (p, x)]
+        return True
+
+    def _rebuild(self, pts : list, site : int) -> Edit_Result:
+        removed = self.edges()
+        ids = [i for i, p in enumerate(pts) if p is not None]
+        f = Forchun([pts[i] for i in ids], self._width)
+        f.all_steps()
+
+        # sweep site -> id, duplicates keep the first
+        glob = [-1] * len(f.sites)
+        for i, u in enumerate(f.site_map):
+            if glob[u] < 0: glob[u] = ids[i]
+
+        self._pts = pts
+        self._build([tuple(glob[v] for v in tri[3:]) for tri in f._vertices])
+        return Edit_Result(site, removed, self.edges(), [i for i, p in enumerate(pts) if p is not None], True)
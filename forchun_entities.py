@@ -4,6 +4,8 @@ import numpy as np
 from PyQt5.QtCore import QPoint
 from PyQt5.QtGui import QPolygon
 
+_EPS = 1e-9
+
 class FEntity:
     @abstractmethod
     def x(self): pass
@@ -20,15 +22,17 @@ class FEntity:
 
 class Site(FEntity):
     pos : tuple[int, int]
+    id : int  # index in Forchun.sites
 
-    def __init__(self, pos : tuple[int, int]):
+    def __init__(self, pos : tuple[int, int], id : int = -1):
         self.pos = pos
+        self.id = id
 
     def x(self): return self.pos[0]
     def y(self): return self.pos[1]
 
     def __copy__(self):
-        return Site((self.x(), self.y()))
+        return Site((self.x(), self.y()), self.id)
 
 class FEvent(FEntity):
     type: int  # 1 - site, 0b10 - intersection
@@ -59,12 +63,13 @@ class Site_Event(FEvent):
     def y(self): return self.site.y()
 
 class Circle_Event(FEvent):
-    d : int
+    d : float
     inter_point : tuple[float, float]
     is_valid = True
     par_node = None  # Node
+    sites : tuple[int, int, int] = None  # left, middle, right site ids
 
-    def __init__(self, d : int, inter_point : tuple[int, int], par_node):
+    def __init__(self, d : float, inter_point : tuple[float, float], par_node):
         self.type = 0b10
         self.d = d
         self.inter_point = inter_point
@@ -96,6 +101,7 @@ class Parabola(FEntity):
         x0, y0 = self.x(), self.y()
 
         if d == y0:
+            x0, d = int(np.round(x0)), int(np.round(d))
             for i in range(1000): out.append(QPoint(x0, d - i))
         else:
             for i, x in enumerate(x_range):
@@ -149,16 +155,20 @@ class Edge(FEntity):
         b1 = b - self.k
         c1 = c - self.b
 
+        # a new edge touches the parabola at its start: the roots coincide up to rounding
         dis = b1 * b1 - 4 * a * c1
-        if dis < 0.: return None
+        if dis < 0.:
+            if dis < -_EPS * (b1 * b1 + abs(4 * a * c1)): return None
+            dis = 0.
         x1, x2 = (-b1 + np.sqrt(dis)) / (2. * a), (-b1 - np.sqrt(dis)) / (2. * a)
 
+        tol = _EPS * (1. + abs(self.x()))
         if self.grow_right:
             x = max(x1, x2)
-            if x < self.x(): return None
+            if x < self.x() - tol: return None
         else:
             x = min(x1, x2)
-            if x > self.x(): return None
+            if x > self.x() + tol: return None
 
         return x, self.k * x + self.b
 
@@ -169,8 +179,11 @@ class Edge(FEntity):
         elif edge.k == np.inf: x = edge.b
         else: x = (edge.b - self.b) / (self.k - edge.k)
 
-        if (self.grow_right and x < self.x()) or (not self.grow_right and x > self.x()) or \
-                (edge.grow_right and x < edge.x()) or (not edge.grow_right and x > edge.x()): return None
+        # cocircular sites meet exactly at the start of the newer edge
+        tol, edge_tol = _EPS * (1. + abs(self.x())), _EPS * (1. + abs(edge.x()))
+        if (self.grow_right and x < self.x() - tol) or (not self.grow_right and x > self.x() + tol) or \
+                (edge.grow_right and x < edge.x() - edge_tol) or (not edge.grow_right and x > edge.x() + edge_tol):
+            return None
 
         return x, self.get_point(x) if edge.k == np.inf else edge.get_point(x)
 
@@ -193,3 +206,47 @@ class Edge(FEntity):
         return out
 
 
+def intersect_edges_parabolas(start : np.ndarray, k : np.ndarray, b : np.ndarray, grow_right : np.ndarray,
+                              site : np.ndarray, d : float) -> np.ndarray:
+    # Edge.get_intersection_with_parabola for many edge, arc pairs at once; (n, 2) points, nan where None
+    sx, px, py = start[:, 0], site[:, 0], site[:, 1]
+    out = np.full((len(k), 2), np.nan)
+    vertical = k == np.inf
+    at_d = py == d
+
+    # vertical edges: the arc point right below, or the site itself when it is on the sweep line
+    m = vertical & ~at_d
+    out[m, 0] = sx[m]
+    out[m, 1] = np.power(np.trunc(sx[m]) - px[m], 2) / (2. * (py[m] - d)) + (d + py[m]) / 2.
+    m = vertical & at_d & (sx == px)
+    out[m] = site[m]
+
+    # a new arc is a vertical ray, it meets the edge only on the growing side
+    m = ~vertical & at_d & np.where(grow_right, px >= sx, px <= sx)
+    out[m, 0] = px[m]
+    out[m, 1] = k[m] * px[m] + b[m]
+
+    m = ~vertical & ~at_d
+    if not m.any(): return out
+    sxm, km, bm, gr = sx[m], k[m], b[m], grow_right[m]
+    pxm, pym = px[m], py[m]
+
+    a = 1. / (2. * (pym - d))
+    t = 2. * a * pxm
+    b1 = -t - km
+    c1 = (d + pym + t * pxm) / 2. - bm
+
+    dis = b1 * b1 - 4 * a * c1
+    ok = dis >= -_EPS * (b1 * b1 + np.abs(4 * a * c1))
+    dis = np.sqrt(np.maximum(dis, 0.))
+    x1, x2 = (-b1 + dis) / (2. * a), (-b1 - dis) / (2. * a)
+
+    tol = _EPS * (1. + np.abs(sxm))
+    x = np.where(gr, np.maximum(x1, x2), np.minimum(x1, x2))
+    ok &= np.where(gr, x >= sxm - tol, x <= sxm + tol)
+
+    res = np.full((len(km), 2), np.nan)
+    res[ok, 0] = x[ok]
+    res[ok, 1] = km[ok] * x[ok] + bm[ok]
+    out[m] = res
+    return out
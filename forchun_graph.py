@@ -0,0 +1,97 @@
+import numpy as np
+
+from forchun import Forchun
+
+
+def _lengths(pts : np.ndarray, indptr : np.ndarray, indices : np.ndarray):
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    d = pts[indices] - pts[rows]
+    return rows, np.hypot(d[:, 0], d[:, 1])
+
+
+def nearest_neighbors(pts, indptr : np.ndarray, indices : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # the nearest neighbour is always a Delaunay neighbour; (index, distance) per site, -1 and inf without any
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    n = len(pts)
+    nn = np.full(n, -1, dtype=np.int64)
+    dist = np.full(n, np.inf)
+    if not len(indices): return nn, dist
+
+    rows, lengths = _lengths(pts, indptr, indices)
+    # by row, then length: the first entry of every row is its minimum
+    order = np.lexsort((lengths, rows))
+    has = np.diff(indptr) > 0
+    first = order[indptr[:-1][has]]
+    nn[has] = indices[first]
+    dist[has] = lengths[first]
+    return nn, dist
+
+
+def euclidean_mst(pts, indptr : np.ndarray, indices : np.ndarray) -> tuple[np.ndarray, float]:
+    # Kruskal over the Delaunay edges, which contain the MST; (m, 2) site pairs and total length.
+    # A forest when the graph is not connected
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    n = len(pts)
+
+    rows, lengths = _lengths(pts, indptr, indices)
+    once = rows < indices
+    rows, cols, lengths = rows[once], indices[once], lengths[once]
+    order = np.argsort(lengths, kind='stable')
+
+    parent = list(range(n))
+
+    def _root(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    picked = []
+    for i, a, b in zip(order.tolist(), rows[order].tolist(), cols[order].tolist()):
+        ra, rb = _root(a), _root(b)
+        if ra == rb: continue
+
+        parent[ra] = rb
+        picked.append(i)
+        if len(picked) == n - 1: break
+
+    picked = np.asarray(picked, dtype=np.int64)
+    return np.column_stack((rows[picked], cols[picked])), float(lengths[picked].sum())
+
+
+def site_graph(forch : Forchun):
+    # (sites, indptr, indices) of a swept diagram, sites as (n, 2) array in Forchun.sites order
+    indptr, indices = forch.adjacency()
+    return np.asarray([s.pos for s in forch.sites], dtype=np.float64).reshape(-1, 2), indptr, indices
+
+
+def locate(pts, indptr : np.ndarray, indices : np.ndarray, q, start : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # nearest site per query point: greedy walks over the Delaunay graph from start always end at it.
+    # All walks step together, one neighbourhood gather per step
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    q = np.asarray(q, dtype=np.float64).reshape(-1, 2)
+    cur = np.asarray(start, dtype=np.int64).copy()
+    d = pts[cur] - q
+    d2 = d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1]
+
+    active = np.arange(len(q))
+    while len(active):
+        c = cur[active]
+        counts = indptr[c + 1] - indptr[c]
+        who = np.repeat(active, counts)
+        offsets = np.arange(len(who)) - np.repeat(np.cumsum(counts) - counts, counts)
+        nb = indices[np.repeat(indptr[c], counts) + offsets]
+
+        d = pts[nb] - q[who]
+        nd2 = d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1]
+        o = np.lexsort((nd2, who))
+        first = np.ones(len(o), dtype=bool)
+        first[1:] = who[o][1:] != who[o][:-1]
+        w, n, nd2 = who[o][first], nb[o][first], nd2[o][first]
+
+        better = nd2 < d2[w]
+        active = w[better]
+        cur[active] = n[better]
+        d2[active] = nd2[better]
+
+    return cur, np.sqrt(d2)
@@ -0,0 +1,109 @@
+import numpy as np
+
+
+class Site_Grid:
+    # uniform bucket grid over sites, cell members stored contiguously (CSR by row-major cell)
+    _pts : np.ndarray
+    _cell : float
+    _x0 : float
+    _y0 : float
+    _nx : int
+    _ny : int
+    _order : np.ndarray  # site indices sorted by cell
+    _start : np.ndarray  # cell -> first position in _order
+
+    def __init__(self, pts : np.ndarray, cell : float = None):
+        self._pts = pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+        n = len(pts)
+
+        lo = pts.min(axis=0) if n else np.zeros(2)
+        hi = pts.max(axis=0) if n else np.ones(2)
+        self._x0, self._y0 = lo
+        if cell is None:
+            # about 2 sites per cell
+            area = max((hi[0] - lo[0]) * (hi[1] - lo[1]), 1.)
+            cell = np.sqrt(2. * area / max(n, 1))
+        self._cell = max(float(cell), 1e-9)
+        self._nx = int((hi[0] - lo[0]) / self._cell) + 1
+        self._ny = int((hi[1] - lo[1]) / self._cell) + 1
+
+        cells = self._cell_of(pts)
+        self._order = np.argsort(cells, kind='stable')
+        self._start = np.searchsorted(cells[self._order], np.arange(self._nx * self._ny + 1))
+
+    def _cell_xy(self, pts : np.ndarray):
+        cx = np.clip(((pts[:, 0] - self._x0) / self._cell).astype(np.int64), 0, self._nx - 1)
+        cy = np.clip(((pts[:, 1] - self._y0) / self._cell).astype(np.int64), 0, self._ny - 1)
+        return cx, cy
+
+    def _cell_of(self, pts : np.ndarray):
+        cx, cy = self._cell_xy(pts)
+        return cy * self._nx + cx
+
+    def points(self): return self._pts
+
+    def cell_size(self): return self._cell
+
+    def bounds(self):
+        return self._x0, self._y0, self._x0 + self._nx * self._cell, self._y0 + self._ny * self._cell
+
+    def query_rect(self, rect : tuple[float, float, float, float]) -> np.ndarray:
+        # indices of sites with x0 <= x <= x1 and y0 <= y <= y1
+        x0, y0, x1, y1 = rect
+        if not len(self._pts): return np.empty(0, dtype=np.int64)
+
+        (cx0, cx1), (cy0, cy1) = self._cell_xy(np.array([[x0, y0], [x1, y1]], dtype=np.float64))
+        parts = []
+        for cy in range(cy0, cy1 + 1):
+            row = cy * self._nx
+            parts.append(self._order[self._start[row + cx0]:self._start[row + cx1 + 1]])
+        idx = np.concatenate(parts)
+
+        p = self._pts[idx]
+        return idx[(p[:, 0] >= x0) & (p[:, 0] <= x1) & (p[:, 1] >= y0) & (p[:, 1] <= y1)]
+
+    def cell_of(self, pts) -> np.ndarray:
+        return self._cell_of(np.asarray(pts, dtype=np.float64).reshape(-1, 2))
+
+    def representatives(self) -> np.ndarray:
+        # per cell one of its sites, empty cells borrow from a near non-empty one; -1 without any sites
+        rep = np.full(self._nx * self._ny, -1, dtype=np.int64)
+        has = np.diff(self._start) > 0
+        rep[has] = self._order[self._start[:-1][has]]
+        rep = rep.reshape(self._ny, self._nx)
+
+        while has.any() and (rep < 0).any():
+            for src, dst in (((slice(1, None), slice(None)), (slice(None, -1), slice(None))),
+                             ((slice(None, -1), slice(None)), (slice(1, None), slice(None))),
+                             ((slice(None), slice(1, None)), (slice(None), slice(None, -1))),
+                             ((slice(None), slice(None, -1)), (slice(None), slice(1, None)))):
+                view = rep[dst]
+                np.copyto(view, rep[src], where=view < 0)
+
+        return rep.ravel()
+
+
+def stratified_levels(pts, first : int = 512, factor : int = 4, seed : int = 0):
+    # yields nested sorted site index sets, each about factor times the previous, the last holds every site.
+    # A level adds one not yet taken site per cell of a grid with as many cells as the level size,
+    # picked among a random sample of 8 candidates per cell so the early levels cost O(level size)
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    n = len(pts)
+
+    lo, hi = (pts.min(axis=0), pts.max(axis=0)) if n else (np.zeros(2), np.ones(2))
+    area = max((hi[0] - lo[0]) * (hi[1] - lo[1]), 1.)
+    perm = np.random.default_rng(seed).permutation(n)
+    taken = np.zeros(n, dtype=bool)
+
+    m = first
+    while m < n:
+        free = perm[~taken[perm]][:8 * m]
+        cell = np.sqrt(area / m)
+        nx = int((hi[0] - lo[0]) / cell) + 1
+        c = ((pts[free, 1] - lo[1]) / cell).astype(np.int64) * nx + ((pts[free, 0] - lo[0]) / cell).astype(np.int64)
+        _, pick = np.unique(c, return_index=True)
+        taken[free[pick]] = True
+        yield np.flatnonzero(taken)
+        m *= factor
+
+    yield np.arange(n)
@@ -0,0 +1,92 @@
+import numpy as np
+
+from forchun import Forchun
+from forchun_index import Site_Grid
+
+
+class Roi_Result:
+    sites : np.ndarray  # input indices of sites inside the rect
+    cells : list[np.ndarray]  # cell polygon per site, vertices ordered by angle; None for an unbounded cell
+    margin : float  # margin of the last sweep
+    swept : int  # sites in the last sweep
+    rounds : int
+
+    def __init__(self, sites : np.ndarray, cells : list[np.ndarray], margin : float, swept : int, rounds : int):
+        self.sites = sites
+        self.cells = cells
+        self.margin = margin
+        self.swept = swept
+        self.rounds = rounds
+
+
+def compute_roi(sites, rect : tuple[float, float, float, float], width : int = None, margin : float = None,
+                grow : float = 2., index : Site_Grid = None) -> Roi_Result:
+    # Sweep the sites of rect grown by margin. A bounded cell is final when every vertex circle around it
+    # lies inside the swept region: no site from outside can be closer to any point of the cell
+    a = np.asarray(sites)
+    if index is None: index = Site_Grid(a)
+    x0, y0, x1, y1 = rect
+    roi = index.query_rect(rect)
+    if margin is None: margin = 2. * index.cell_size()
+
+    rounds = 0
+    while True:
+        rounds += 1
+        q = (x0 - margin, y0 - margin, x1 + margin, y1 + margin)
+        sub = index.query_rect(q)
+        complete = len(sub) == len(a)
+
+        f = Forchun(a[sub].tolist(), width if width else int(np.ceil(q[2] - q[0])) + 1)
+        f.all_steps()
+
+        sorter = np.argsort(sub)
+        roi_local = np.asarray(f.site_map, dtype=np.int64)[sorter[np.searchsorted(sub, roi, sorter=sorter)]]
+        is_roi = np.zeros(len(f.sites), dtype=bool)
+        is_roi[roi_local] = True
+
+        is_open = np.zeros(len(f.sites), dtype=bool)
+        is_open[[node.par.site.id for node in f.beachline.arcs()]] = True
+
+        v = np.asarray(f._vertices, dtype=np.float64).reshape(-1, 6)
+        tri = v[:, 3:].astype(np.int64)
+        v = v[is_roi[tri].any(axis=1)]
+        tri = tri[is_roi[tri].any(axis=1)]
+
+        if complete: break
+
+        x, y, r = v[:, 0], v[:, 1], v[:, 2]
+        need = np.max(np.concatenate(([0.], x0 - (x - r), (x + r) - x1, y0 - (y - r), (y + r) - y1)))
+        if need <= margin and not is_open[roi_local].any(): break
+
+        margin = max(margin * grow, need * 1.01)
+
+    return Roi_Result(roi, _cells(f, roi_local, is_roi, is_open, v, tri), margin, len(sub), rounds)
+
+
+def _cells(f : Forchun, roi_local : np.ndarray, is_roi : np.ndarray, is_open : np.ndarray,
+           v : np.ndarray, tri : np.ndarray) -> list:
+    # (site, vertex) pairs ordered by site, then by angle around the site
+    site = tri.ravel()
+    vert = np.repeat(np.arange(len(v)), 3)
+    m = is_roi[site]
+    site, vert = site[m], vert[m]
+
+    s_xy = np.asarray([s.pos for s in f.sites], dtype=np.float64).reshape(-1, 2)
+    p = v[vert, :2]
+    ang = np.arctan2(p[:, 1] - s_xy[site, 1], p[:, 0] - s_xy[site, 0])
+    order = np.lexsort((ang, site))
+    site, p = site[order], p[order]
+    bounds = np.searchsorted(site, np.arange(len(f.sites) + 1))
+
+    polys = {}
+    for s in np.unique(roi_local).tolist():
+        if is_open[s]:
+            polys[s] = None
+            continue
+        poly = p[bounds[s]:bounds[s + 1]]
+        # cocircular sites give the same vertex several times
+        keep = np.ones(len(poly), dtype=bool)
+        keep[1:] = np.hypot(*(poly[1:] - poly[:-1]).T) > 1e-7
+        polys[s] = poly[keep]
+
+    return [polys[s] for s in roi_local.tolist()]
@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import collections
+import os
+import socket
+import struct
+import time
+
+import numpy as np
+
+from forchun import Forchun
+from forchun_graph import locate, site_graph
+from forchun_index import Site_Grid
+import site_generator
+
+# Little endian frames over a persistent stream. Request: u32 id, u8 op, u32 count, payload.
+# Response: u32 id, u8 status, u32 count, payload; an error carries a utf-8 message of count bytes
+_HEADER = struct.Struct('<IBI')
+_STATS = struct.Struct('<QQddd')
+
+OP_LOCATE = 1  # count x (f64 x, f64 y) -> count x i32 site, count x f64 distance
+OP_NEIGHBORS = 2  # count x i32 site -> count x u32 degree, sum of degrees x i32 site
+OP_SITES = 3  # count x i32 site -> count x (f64 x, f64 y)
+OP_STATS = 4  # no payload -> u64 requests, u64 queries, f64 latency p50, p95, p99 in microseconds
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_ITEM_BYTES = {OP_LOCATE: 16, OP_NEIGHBORS: 4, OP_SITES: 4, OP_STATS: 0}
+
+
+class Diagram_Index:
+    # sites, Delaunay adjacency and a point location start per grid cell, all site ids are Forchun.sites ids
+    pts : np.ndarray
+    indptr : np.ndarray
+    indices : np.ndarray
+    _grid : Site_Grid
+    _reps : np.ndarray  # cell -> walk start site
+
+    def __init__(self, pts : np.ndarray, indptr : np.ndarray, indices : np.ndarray):
+        self.pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self._grid = Site_Grid(self.pts)
+        self._reps = self._grid.representatives()
+
+    @staticmethod
+    def from_forchun(f : Forchun):
+        if not f._events_q.empty(): f.all_steps()
+        return Diagram_Index(*site_graph(f))
+
+    @staticmethod
+    def load(path : str):
+        data = np.load(path)
+        return Diagram_Index(data['pts'], data['indptr'], data['indices'])
+
+    def save(self, path : str):
+        with open(path, 'wb') as f: np.savez(f, pts=self.pts, indptr=self.indptr, indices=self.indices)
+
+    def locate(self, q : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        q = np.asarray(q, dtype=np.float64).reshape(-1, 2)
+        if not len(self.pts): return np.full(len(q), -1, dtype=np.int64), np.full(len(q), np.inf)
+        return locate(self.pts, self.indptr, self.indices, q, self._reps[self._grid.cell_of(q)])
+
+    def neighbors(self, ids : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # (degree per id, neighbours of all ids concatenated)
+        ids = self._check(ids)
+        lo, hi = self.indptr[ids], self.indptr[ids + 1]
+        counts = hi - lo
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return counts, self.indices[np.repeat(lo, counts) + offsets]
+
+    def sites(self, ids : np.ndarray) -> np.ndarray:
+        return self.pts[self._check(ids)]
+
+    def _check(self, ids : np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        bad = (ids < 0) | (ids >= len(self.pts))
+        if bad.any(): raise ValueError(f'unknown site {ids[bad][0]}, the diagram has {len(self.pts)} sites')
+        return ids
+
+
+class Forchun_Server:
+    # answers batched queries against one in-memory Diagram_Index, requests on a connection are served in order
+    index : Diagram_Index
+    requests : int = 0
+    queries : int = 0
+    _latency : collections.deque  # seconds from a full request to its response written, the latest ones
+
+    def __init__(self, index : Diagram_Index, keep : int = 10000):
+        self.index = index
+        self._latency = collections.deque(maxlen=keep)
+
+    async def serve(self, path : str = None, host : str = '127.0.0.1', port : int = 0):
+        # Unix socket at path, else TCP on host:port (0 picks a free port)
+        if path is None: return await asyncio.start_server(self._connection, host, port)
+        if os.path.exists(path): os.unlink(path)
+        return await asyncio.start_unix_server(self._connection, path)
+
+    def stats(self) -> tuple[int, int, float, float, float]:
+        if not self._latency: return self.requests, self.queries, 0., 0., 0.
+        p50, p95, p99 = np.percentile(np.asarray(self._latency) * 1e6, (50, 95, 99))
+        return self.requests, self.queries, p50, p95, p99
+
+    async def _connection(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter):
+        try:
+            while True:
+                try: rid, op, count = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                except asyncio.IncompleteReadError: break
+
+                if op not in _ITEM_BYTES:
+                    # the payload size is unknown, the stream can not be resynced
+                    writer.write(self._error(rid, f'unknown op {op}'))
+                    break
+                payload = await reader.readexactly(count * _ITEM_BYTES[op])
+
+                t = time.perf_counter()
+                # a failed request gets an error reply, the connection stays usable
+                try: out = _HEADER.pack(rid, STATUS_OK, count) + self._answer(op, count, payload)
+                except ValueError as e: out = self._error(rid, str(e))
+                except Exception as e: out = self._error(rid, f'{type(e).__name__}: {e}')
+                writer.write(out)
+                self._latency.append(time.perf_counter() - t)
+                self.requests += 1
+                self.queries += count
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _answer(self, op : int, count : int, payload : bytes) -> bytes:
+        if op == OP_LOCATE:
+            ids, dist = self.index.locate(np.frombuffer(payload, dtype='<f8'))
+            return ids.astype('<i4').tobytes() + dist.astype('<f8').tobytes()
+        if op == OP_NEIGHBORS:
+            counts, nbs = self.index.neighbors(np.frombuffer(payload, dtype='<i4'))
+            return counts.astype('<u4').tobytes() + nbs.astype('<i4').tobytes()
+        if op == OP_SITES:
+            return self.index.sites(np.frombuffer(payload, dtype='<i4')).astype('<f8').tobytes()
+        return _STATS.pack(*self.stats())
+
+    @staticmethod
+    def _error(rid : int, msg : str) -> bytes:
+        data = msg.encode('utf-8')
+        return _HEADER.pack(rid, STATUS_ERROR, len(data)) + data
+
+
+class Forchun_Client:
+    # blocking client on one persistent connection, keeps the round trip seconds of every request
+    latencies : list[float]
+    _sock : socket.socket
+    _next_id : int = 0
+
+    def __init__(self, path : str = None, host : str = '127.0.0.1', port : int = None):
+        if path is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(path)
+        else:
+            self._sock = socket.create_connection((host, port))
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.latencies = []
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): self.close()
+
+    def locate(self, points) -> tuple[np.ndarray, np.ndarray]:
+        # nearest site id and distance per point
+        points = np.ascontiguousarray(points, dtype='<f8').reshape(-1, 2)
+        payload = self._request(OP_LOCATE, len(points), points.tobytes())
+        n = len(points)
+        return (np.frombuffer(payload, dtype='<i4', count=n).astype(np.int64),
+                np.frombuffer(payload, dtype='<f8', offset=4 * n))
+
+    def neighbors(self, ids) -> list[np.ndarray]:
+        ids = np.ascontiguousarray(ids, dtype='<i4').ravel()
+        if not len(ids): return []
+        payload = self._request(OP_NEIGHBORS, len(ids), ids.tobytes())
+        counts = np.frombuffer(payload, dtype='<u4', count=len(ids)).astype(np.int64)
+        nbs = np.frombuffer(payload, dtype='<i4', offset=4 * len(ids)).astype(np.int64)
+        return np.split(nbs, np.cumsum(counts)[:-1])
+
+    def sites(self, ids) -> np.ndarray:
+        ids = np.ascontiguousarray(ids, dtype='<i4').ravel()
+        return np.frombuffer(self._request(OP_SITES, len(ids), ids.tobytes()), dtype='<f8').reshape(-1, 2)
+
+    def stats(self) -> dict:
+        requests, queries, p50, p95, p99 = _STATS.unpack(self._request(OP_STATS, 0, b''))
+        return {'requests': requests, 'queries': queries, 'p50 us': p50, 'p95 us': p95, 'p99 us': p99}
+
+    def _request(self, op : int, count : int, payload : bytes) -> bytes:
+        rid = self._next_id
+        self._next_id = (rid + 1) & 0xffffffff
+
+        t = time.perf_counter()
+        self._sock.sendall(_HEADER.pack(rid, op, count) + payload)
+        got, status, size = _HEADER.unpack(self._recv(_HEADER.size))
+        if status == STATUS_ERROR: raise ValueError(self._recv(size).decode('utf-8'))
+
+        if op == OP_LOCATE: data = self._recv(12 * size)
+        elif op == OP_NEIGHBORS:
+            head = self._recv(4 * size)
+            data = head + self._recv(4 * int(np.frombuffer(head, dtype='<u4').sum()))
+        elif op == OP_SITES: data = self._recv(16 * size)
+        else: data = self._recv(_STATS.size)
+        self.latencies.append(time.perf_counter() - t)
+
+        if got != rid: raise ConnectionError(f'response {got} to request {rid}')
+        return data
+
+    def _recv(self, size : int) -> bytes:
+        buf = bytearray(size)
+        view = memoryview(buf)
+        while view:
+            k = self._sock.recv_into(view)
+            if not k: raise ConnectionError('server closed the connection')
+            view = view[k:]
+        return bytes(buf)
+
+
+def build_index(args) -> Diagram_Index:
+    # load the saved index, else compute it from a checkpoint, a sites file or generated sites and save it
+    if args.index and os.path.exists(args.index): return Diagram_Index.load(args.index)
+
+    if args.resume: f = Forchun.resume(args.resume)
+    else:
+        if args.sites: sites = np.loadtxt(args.sites, ndmin=2)
+        else: sites = site_generator.generate(args.generate, args.n, args.width, args.height, args.seed)
+        f = Forchun(sites.tolist(), args.width)
+    index = Diagram_Index.from_forchun(f)
+
+    if args.index: index.save(args.index)
+    return index
+
+
+def bench(args):
+    # round trip latency of each batch size against a running server
+    rng = np.random.default_rng(args.seed)
+    with Forchun_Client(args.unix, args.host, args.port) as c:
+        print(f'{"op":<10} {"batch":>7} {"p50 us":>9} {"p95 us":>9} {"p99 us":>9} {"queries/s":>11}')
+        for batch in args.batch:
+            for op in ('locate', 'neighbors'):
+                c.latencies = []
+                for _ in range(args.requests):
+                    if op == 'locate': ids, _ = c.locate(rng.random((batch, 2)) * (args.width, args.height))
+                    else: c.neighbors(ids[:batch])
+                t = np.asarray(c.latencies) * 1e6
+                p50, p95, p99 = np.percentile(t, (50, 95, 99))
+                print(f'{op:<10} {batch:>7} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {batch * 1e6 / t.mean():>11.0f}')
+        s = c.stats()
+        print(f'server: {s["requests"]} requests, {s["queries"]} queries, '
+              f'p50 {s["p50 us"]:.1f} us, p95 {s["p95 us"]:.1f} us, p99 {s["p99 us"]:.1f} us')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local point location and adjacency server for one diagram')
+    parser.add_argument('mode', choices=['serve', 'bench'])
+    parser.add_argument('--unix', default=None, help='Unix socket path, TCP otherwise')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7878)
+    parser.add_argument('--index', default=None, help='saved index, written after computing when missing')
+    parser.add_argument('--resume', default=None, help='compute from a checkpoint')
+    parser.add_argument('--sites', default=None, help='compute from a file of "x y" lines')
+    parser.add_argument('--generate', choices=list(site_generator.DISTRIBUTIONS), default='uniform')
+    parser.add_argument('-n', type=int, default=100000)
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch', type=int, nargs='*', default=[1, 16, 256, 4096], help='bench batch sizes')
+    parser.add_argument('--requests', type=int, default=1000, help='bench requests per batch size')
+    args = parser.parse_args()
+
+    if args.mode == 'bench': return bench(args)
+
+    t = time.perf_counter()
+    index = build_index(args)
+    print(f'{len(index.pts)} sites, {len(index.indices) // 2} edges in {(time.perf_counter() - t) * 1e3:.0f} ms')
+
+    async def _run():
+        server = Forchun_Server(index)
+        srv = await server.serve(args.unix, args.host, args.port)
+        print('listening on', args.unix or f'{args.host}:{args.port}')
+        async with srv: await srv.serve_forever()
+
+    try: asyncio.run(_run())
+    except KeyboardInterrupt: pass
+
+
+if __name__ == "__main__":
+    main()
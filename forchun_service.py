@@ -0,0 +1,243 @@
+import asyncio
+import atexit
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from forchun import Forchun
+
+# header: cancel flag, sites count, sites are integer, edges count
+_HEADER = 4
+_CANCEL_CHECK = 256  # events between cancel flag checks
+
+
+class _Job_Block:
+    # one shared memory block per job: int64 header, float64 sites (n, 2), float64 edges (capacity, 4)
+    shm : shared_memory.SharedMemory
+    n : int
+    capacity : int
+
+    def __init__(self, shm : shared_memory.SharedMemory, n : int):
+        self.shm = shm
+        self.n = n
+        self.capacity = _capacity(n)
+
+    @staticmethod
+    def create(sites : np.ndarray, is_int : bool):
+        n = len(sites)
+        shm = shared_memory.SharedMemory(create=True, size=_block_size(n))
+        block = _Job_Block(shm, n)
+
+        header, sites_v, _ = block.views()
+        header[:] = (0, n, int(is_int), 0)
+        sites_v[:] = sites
+        del header, sites_v
+
+        return block
+
+    @staticmethod
+    def attach(name : str, n : int):
+        return _Job_Block(shared_memory.SharedMemory(name=name), n)
+
+    def views(self):
+        buf = self.shm.buf
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=buf)
+        sites = np.ndarray((self.n, 2), dtype=np.float64, buffer=buf, offset=header.nbytes)
+        edges = np.ndarray((self.capacity, 4), dtype=np.float64, buffer=buf, offset=header.nbytes + sites.nbytes)
+        return header, sites, edges
+
+    def cancel(self):
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=self.shm.buf)
+        header[0] = 1
+        del header
+
+    def result(self, count : int):
+        _, _, edges = self.views()
+        out = edges[:count].copy()
+        del edges
+        return out
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _capacity(n : int):
+    # every circle event completes two edges, there are at most 2n of them
+    return 4 * n + 8
+
+def _block_size(n : int):
+    return 8 * (_HEADER + 2 * n + 4 * _capacity(n))
+
+
+def _run_job(name : str, n : int, width : int) -> int:
+    try: block = _Job_Block.attach(name, n)
+    except FileNotFoundError: return -1  # cancelled before start
+
+    header, sites, edges = block.views()
+    try:
+        if header[2]: sites = sites.astype(np.int64)
+        f = Forchun(sites.tolist(), width)
+
+        steps = 0
+        while not f._events_q.empty():
+            if steps % _CANCEL_CHECK == 0 and header[0]: return -1
+            f.next_step()
+            steps += 1
+
+        count = len(f._complete_edges)
+        if count: edges[:count] = np.asarray(f._complete_edges, dtype=np.float64).reshape(count, 4)
+        header[3] = count
+        return count
+    finally:
+        del header, sites, edges
+        block.shm.close()
+
+
+class Forchun_Service_Stats:
+    queue_depth : int  # submitted and not finished yet
+    completed : int
+    cancelled : int
+    timed_out : int
+    failed : int
+
+    jobs_per_sec : float
+    sites_per_sec : float
+
+    def __init__(self, queue_depth : int, completed : int, cancelled : int, timed_out : int, failed : int,
+                 jobs_per_sec : float, sites_per_sec : float):
+        self.queue_depth = queue_depth
+        self.completed = completed
+        self.cancelled = cancelled
+        self.timed_out = timed_out
+        self.failed = failed
+        self.jobs_per_sec = jobs_per_sec
+        self.sites_per_sec = sites_per_sec
+
+    def __repr__(self):
+        return f'queue {self.queue_depth}, done {self.completed}, cancelled {self.cancelled}, ' \
+               f'timed out {self.timed_out}, failed {self.failed}, ' \
+               f'{self.jobs_per_sec:.1f} jobs/s, {self.sites_per_sec:.0f} sites/s'
+
+
+class Forchun_Service:
+    _pool : ProcessPoolExecutor = None
+    _width : int
+    _workers : int
+
+    _queue_depth = 0
+    _completed = 0
+    _cancelled = 0
+    _timed_out = 0
+    _failed = 0
+    _sites_done = 0
+    _started : float
+
+    _slots_loop = None
+    _slots_sem : asyncio.Semaphore = None
+
+    def __init__(self, width : int = 800, workers : int = None, mp_context = None):
+        self._width = width
+        self._workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=self._workers, mp_context=mp_context)
+        self._started = time.perf_counter()
+
+    def _slots(self) -> asyncio.Semaphore:
+        # jobs holding a shared memory block, one per worker; a semaphore belongs to the loop it first waits in
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots_loop = loop
+            self._slots_sem = asyncio.Semaphore(self._workers)
+        return self._slots_sem
+
+    async def compute(self, sites, timeout : float = None) -> np.ndarray:
+        """Completed edges of one diagram as (m, 4) array of x1, y1, x2, y2.
+        The timeout runs from the start of the job, waiting for a free worker does not count."""
+        if self._pool is None: raise RuntimeError('service is closed')
+
+        sites = np.asarray(sites)
+        is_int = sites.dtype.kind in 'iu'
+        sites = sites.astype(np.float64).reshape(-1, 2)
+
+        block = None
+        self._queue_depth += 1
+        try:
+            async with self._slots():
+                block = _Job_Block.create(sites, is_int)
+                fut = asyncio.get_running_loop().run_in_executor(self._pool, _run_job, block.shm.name, len(sites),
+                                                                 self._width)
+                done, _ = await asyncio.wait({fut}, timeout=timeout)
+                if not done:
+                    # the worker stops at its next cancel check, the slot stays taken until then
+                    block.cancel()
+                    await fut
+                    raise asyncio.TimeoutError()
+                count = fut.result()
+            if count < 0: raise asyncio.CancelledError()
+
+            self._completed += 1
+            self._sites_done += len(sites)
+            return block.result(count)
+
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            raise
+        except asyncio.CancelledError:
+            self._cancelled += 1
+            if block: block.cancel()
+            raise
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._queue_depth -= 1
+            if block: block.release()
+
+    async def compute_many(self, site_sets, timeout : float = None) -> list:
+        """Per-job timeout; timed out or failed jobs come back as exception instances.
+        At most one job per worker holds its shared memory block, the rest wait without one."""
+        return await asyncio.gather(*(self.compute(s, timeout) for s in site_sets), return_exceptions=True)
+
+    def stats(self):
+        spent = max(time.perf_counter() - self._started, 1e-9)
+        return Forchun_Service_Stats(self._queue_depth, self._completed, self._cancelled, self._timed_out,
+                                     self._failed, self._completed / spent, self._sites_done / spent)
+
+    def close(self):
+        if self._pool is None: return
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+
+    async def __aenter__(self): return self
+
+    async def __aexit__(self, *args): self.close()
+
+
+_default_service : Forchun_Service = None
+
+def default_service():
+    global _default_service
+    if _default_service is None:
+        _default_service = Forchun_Service()
+        atexit.register(_default_service.close)
+    return _default_service
+
+async def compute_many(site_sets, timeout : float = None) -> list:
+    return await default_service().compute_many(site_sets, timeout)
+
+
+if __name__ == "__main__":
+    from random import randint
+
+    async def _main():
+        sets = [[(randint(0, 800), randint(0, 600)) for _ in range(200)] for _ in range(500)]
+        async with Forchun_Service() as service:
+            t = time.perf_counter()
+            res = await service.compute_many(sets)
+            print(f'{len(res)} diagrams in {time.perf_counter() - t:.2f}s')
+            print(service.stats())
+
+    asyncio.run(_main())
@@ -1,32 +1,119 @@
 import os
 import sys
+import time
 import typing
 
 from PyQt5 import QtGui
 from PyQt5.QtWidgets import QMainWindow, QLabel, QScrollArea, QSizePolicy, QFileDialog, QApplication, QVBoxLayout, \
-    QHBoxLayout, QPushButton, QWidget, QLineEdit, QSplitter, QTextEdit, QFrame, QErrorMessage, QCheckBox, QGridLayout
-from PyQt5.QtGui import QImage, QPainter, QPixmap, QPalette, QPen, QColor, QFont
-from PyQt5.QtCore import Qt, QSize, pyqtSignal, QPoint
+    QHBoxLayout, QPushButton, QWidget, QLineEdit, QSplitter, QFrame, QErrorMessage, QCheckBox, QGridLayout, \
+    QTableView, QHeaderView, QComboBox, QShortcut
+from PyQt5.QtGui import QImage, QPainter, QPixmap, QPalette, QPen, QColor, QFont, QKeySequence
+from PyQt5.QtCore import Qt, QSize, pyqtSignal, QPoint, QPointF, QRectF, QLineF, QAbstractTableModel, QModelIndex, \
+    QObject, QThread
 
 import numpy as np
-from random import randint
 import graphviz
 
-from forchun import Forchun, Forchun_Draw_Result, Beachline, Node
+from forchun import Forchun, Forchun_Draw_Result, Beachline, Node, Event_Index
+from forchun_dynamic import Dynamic_Diagram, Edit_Result
+from forchun_index import stratified_levels
+import site_generator
+
+
+class Sweep_Worker(QObject):
+    # runs the sweep in chunks on its own thread, the owner must not touch forch until done
+    progress = pyqtSignal(int, float)  # events processed, sweep y
+    edges = pyqtSignal(list)  # completed edges since the previous emit
+    done = pyqtSignal(bool)  # cancelled
+
+    CHUNK = 100  # events between cancel checks
+    MIN_INTERVAL = 1. / 30  # seconds between emits
+
+    _forch : Forchun
+    _cancelled : bool
+
+    def __init__(self, forch : Forchun):
+        super().__init__()
+        self._forch = forch
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        f = self._forch
+        events = 0
+        sent = len(f._complete_edges)
+        last = 0.
+
+        while not self._cancelled:
+            n = f.run_steps(self.CHUNK)
+            events += n
+            finished = n < self.CHUNK
+
+            now = time.perf_counter()
+            if finished or now - last >= self.MIN_INTERVAL:
+                last = now
+                new = f._complete_edges[sent:]
+                sent += len(new)
+                self.edges.emit(new)
+                self.progress.emit(events, float(f.cur_d))
+
+            if finished: break
+
+        self.done.emit(self._cancelled)
+
+
+class Preview_Worker(QObject):
+    # sweeps nested stratified subsets of the sites on its own thread, the last level is the full set
+    level = pyqtSignal(list, list)  # sites of the level, its completed edges
+    done = pyqtSignal(object)  # swept Forchun of all sites, None when cancelled
+
+    CHUNK = 1000  # events between cancel checks
+
+    _sites : np.ndarray
+    _width : int
+    _cancelled : bool
+
+    def __init__(self, sites : np.ndarray, width : int):
+        super().__init__()
+        self._sites = sites
+        self._width = width
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        f = None
+        for idx in stratified_levels(self._sites):
+            if self._cancelled: break
+            sites = self._sites[idx].tolist()
+            f = Forchun(sites, self._width)
+            while not self._cancelled and f.run_steps(self.CHUNK) == self.CHUNK: pass
+            if self._cancelled: break
+            self.level.emit(sites, f._complete_edges)
+
+        self.done.emit(None if self._cancelled else f)
 
 
 class Image_Area(QScrollArea):
     class Image_Label(QLabel):
         _signal : pyqtSignal
+        _press_signal : pyqtSignal
 
-        def __init__(self, signal):
+        def __init__(self, signal, press_signal):
             super().__init__()
             self.setMouseTracking(True)
             self._signal = signal
+            self._press_signal = press_signal
 
         def mouseMoveEvent(self, e):
             self._signal.emit(e)
 
+        def mousePressEvent(self, e):
+            self._press_signal.emit(e)
+
     _image_label : Image_Label
 
     _back_color : QColor
@@ -40,8 +127,24 @@ class Image_Area(QScrollArea):
     _origin : QPixmap
 
     _mouse_signal = pyqtSignal([QtGui.QMouseEvent])
+    _press_signal = pyqtSignal([QtGui.QMouseEvent])
     _graph_sig : pyqtSignal
 
+    progress_sig = pyqtSignal(int, float)  # events processed, sweep y
+    preview_sig = pyqtSignal(int, int)  # sites shown by the preview, all sites
+    sites_sig = pyqtSignal(list)  # sites after a click edited the diagram
+
+    _diagram : Dynamic_Diagram = None  # finished diagram, clicks insert and remove sites in it
+    _final : QPixmap = None  # the diagram as painted after the last edit
+    _forch_stale = False  # forch still holds the sites before the edits
+
+    PROGRESSIVE_MIN = 20000  # site sets from this size are shown coarse to fine
+
+    _worker : Sweep_Worker | Preview_Worker = None
+    _thread : QThread = None
+    _partial : QPixmap  # origin plus completed edges received from the worker
+    _sites_total : int  # sites of the running preview
+
     forch : Forchun = None
 
     def __init__(self, size : QSize, graph_sig : pyqtSignal):
@@ -51,7 +154,8 @@ class Image_Area(QScrollArea):
         self._set_pens()
 
         self._mouse_signal.connect(self._mouse_move)
-        self._image_label = Image_Area.Image_Label(self._mouse_signal)
+        self._press_signal.connect(self._mouse_press)
+        self._image_label = Image_Area.Image_Label(self._mouse_signal, self._press_signal)
         self._image_label.setBackgroundRole(QPalette.Base)
         self._image_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
         self._image_label.setScaledContents(True)
@@ -89,9 +193,22 @@ class Image_Area(QScrollArea):
         self._circle_event_not_valid_pen.setColor(QColor(128, 128, 128, 255))
 
     def set_image(self, size : QSize, sites : list[tuple[int, int]] = None):
+        self._stop_worker()
+        self._diagram = None
+        self._final = None
+        self._forch_stale = False
+
         pix = QPixmap(size)
         pix.fill(self._back_color)
 
+        self.forch = None
+        if sites and len(sites) >= self.PROGRESSIVE_MIN:
+            self._origin = pix
+            self._image_label.setPixmap(pix)
+            self._image_label.resize(size)
+            self._start_preview(np.asarray(sites, dtype=np.int64).reshape(-1, 2))
+            return
+
         if sites:
             self.forch = Forchun(sites, size.width())
 
@@ -113,20 +230,21 @@ class Image_Area(QScrollArea):
         size = pix.size()
         pain = QPainter(pix)
 
+        y = int(round(y))
         pain.setPen(self._line_pen)
         pain.drawLine(0, y, size.width(), y)
 
-        if to_draw.site_events:
+        events = to_draw.events
+        if len(events) > size.height(): self._draw_event_density(pain, events, size)
+        else:
             pain.setPen(self._sites_event_pen)
-            for e in to_draw.site_events: pain.drawLine(0, e, size.width(), e)
+            for e in events.site_ys().tolist(): pain.drawLine(0, int(e), size.width(), int(e))
 
-        if to_draw.circle_events:
-            for e, is_valid in to_draw.circle_events:
-                if is_valid:
-                    pain.setPen(self._circle_event_pen)
-                else:
-                    pain.setPen(self._circle_event_not_valid_pen)
-                pain.drawLine(0, e, size.width(), e)
+            for is_valid, pen in ((True, self._circle_event_pen), (False, self._circle_event_not_valid_pen)):
+                pain.setPen(pen)
+                for e in events.circle_ys(is_valid):
+                    e = int(round(e))
+                    pain.drawLine(0, e, size.width(), e)
 
         if to_draw.completed:
             pain.setPen(self._complete_line_pen)
@@ -140,29 +258,233 @@ class Image_Area(QScrollArea):
         self._image_label.setPixmap(pix)
         self._graph_sig.emit(self.forch.beachline)
 
+    def _draw_event_density(self, pain : QPainter, events : Event_Index, size : QSize):
+        # more events than scanlines: one bar per scanline, site, valid and invalid circle events stacked
+        # from the left, the fullest scanline spans the width
+        counts = np.stack(events.histogram(size.height()))
+        top = counts.sum(axis=0).max()
+        if not top: return
+        ends = (np.cumsum(counts, axis=0) * (size.width() / top)).round().astype(int)
+        starts = np.vstack((np.zeros((1, counts.shape[1]), dtype=int), ends[:-1]))
+
+        pens = (self._sites_event_pen, self._circle_event_pen, self._circle_event_not_valid_pen)
+        for pen, x0, x1 in zip(pens, starts.tolist(), ends.tolist()):
+            pain.setPen(pen)
+            for y, (a, b) in enumerate(zip(x0, x1)):
+                if b > a: pain.drawLine(a, y, b - 1, y)
+
+    def is_running(self): return self._thread is not None
+
+    def _sync_forch(self):
+        # the sweep picks up click edits only when it is used again
+        if not self._forch_stale: return
+        self._forch_stale = False
+        self.forch = Forchun([p for p in self._diagram.sites() if p is not None], self._origin.width())
+
     def _update_image(self, y : int):
-        if not self.forch: return
+        if not self.forch or self.is_running(): return
+        self._sync_forch()
         self._draw(self.forch.draw_by(y), y)
 
     def draw_next(self):
-        if not self.forch: return
+        if not self.forch or self.is_running(): return
+        self._sync_forch()
         self.forch.next_step()
         self._draw(self.forch.draw_current(), self.forch.cur_d)
 
     def draw_prev(self):
-        if not self.forch: return
+        if not self.forch or self.is_running(): return
+        self._sync_forch()
         self._draw(self.forch.draw_by_prev_step(), self.forch.cur_d)
 
     def draw_all(self):
-        if not self.forch: return
-        self.forch.all_steps()
+        if not self.forch or self.is_running(): return
+        self._sync_forch()
+
+        self._partial = self._origin.copy()
+        pain = QPainter(self._partial)
+        pain.setPen(self._complete_line_pen)
+        for (x1, y1), (x2, y2) in self.forch._complete_edges: pain.drawLine(x1, y1, x2, y2)
+        pain.end()
+
+        self._thread = QThread()
+        self._worker = Sweep_Worker(self.forch)
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run)
+        self._worker.edges.connect(self._draw_partial)
+        self._worker.progress.connect(self._progress)
+        self._worker.done.connect(self._sweep_done)
+        self._thread.start()
+
+    def cancel_all(self):
+        if self._worker: self._worker.cancel()
+
+    def _stop_worker(self):
+        if not self._thread: return
+        self._worker.cancel()
+        self._thread.quit()
+        self._thread.wait()
+        self._thread = None
+        self._worker = None
+
+    def _stale(self) -> bool:
+        # a stopped worker may still have queued signals, only the running one is listened to
+        return self._worker is None or self.sender() is not self._worker
+
+    def _draw_partial(self, edges : list):
+        if self._stale(): return
+        pain = QPainter(self._partial)
+        pain.setPen(self._complete_line_pen)
+        for (x1, y1), (x2, y2) in edges: pain.drawLine(x1, y1, x2, y2)
+        pain.end()
+
+    def _progress(self, events : int, y : float):
+        if self._stale(): return
+        pix = self._partial.copy()
+        pain = QPainter(pix)
+        pain.setPen(self._line_pen)
+        y = int(round(y))
+        pain.drawLine(0, y, pix.width(), y)
+        pain.end()
+
+        self._image_label.setPixmap(pix)
+        self.progress_sig.emit(events, y)
+
+    def _sweep_done(self, cancelled : bool):
+        if self._stale(): return
+        self._thread.quit()
+        self._thread.wait()
+        self._thread = None
+        self._worker = None
+
+        if cancelled:
+            self._draw(self.forch.draw_current(), self.forch.cur_d)
+            return
+        self._draw_finished()
+
+    def _draw_finished(self):
+        self._diagram = Dynamic_Diagram.from_forchun(self.forch)
+        self._final = None
+
         self.forch.cur_d += self.height()
         self._draw(self.forch.draw_current(), self.forch.cur_d)
         self.forch.cur_d -= self.height()
 
+    def _start_preview(self, sites : np.ndarray):
+        # the first level shows after a few hundred sites are swept, Next, Previous and All wait for the last
+        self._sites_total = len(sites)
+        self._thread = QThread()
+        self._worker = Preview_Worker(sites, self._origin.width())
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run)
+        self._worker.level.connect(self._preview_level)
+        self._worker.done.connect(self._preview_done)
+        self._thread.start()
+
+    def _preview_level(self, sites : list, edges : list):
+        if self._stale(): return
+        self._origin.fill(self._back_color)
+        pain = QPainter(self._origin)
+        pain.setPen(self._sites_pen)
+        for x, y in sites: pain.drawPoint(x, y)
+        pain.end()
+
+        pix = self._origin.copy()
+        pain = QPainter(pix)
+        pain.setPen(self._complete_line_pen)
+        for (x1, y1), (x2, y2) in edges: pain.drawLine(x1, y1, x2, y2)
+        pain.end()
+
+        self._image_label.setPixmap(pix)
+        self.preview_sig.emit(len(sites), self._sites_total)
+
+    def _preview_done(self, f : Forchun):
+        if self._stale(): return
+        sites = self._worker._sites
+        self._thread.quit()
+        self._thread.wait()
+        self._thread = None
+        self._worker = None
+
+        if f is None:
+            # cancelled: the coarse edges stay on screen, stepping starts on all sites
+            self.forch = Forchun(sites.tolist(), self._origin.width())
+            self._origin.fill(self._back_color)
+            pain = QPainter(self._origin)
+            pain.setPen(self._sites_pen)
+            for x, y in sites.tolist(): pain.drawPoint(x, y)
+            pain.end()
+            return
+
+        self.forch = f
+        self._draw_finished()
+
     def _mouse_move(self, e):
         self._update_image(e.y())
 
+    def _mouse_press(self, e):
+        # on a finished diagram: left click inserts a site, right click removes the nearest one
+        if not self._diagram or self.is_running(): return
+
+        pos = (e.x(), e.y())
+        if e.button() == Qt.LeftButton: res = self._diagram.insert_site(pos)
+        elif e.button() == Qt.RightButton:
+            s = self._diagram.nearest_site(pos)
+            if s < 0: return
+            pos = self._diagram.sites()[s]
+            res = self._diagram.remove_site(s)
+        else: return
+
+        self._draw_edit(res, pos)
+        self._forch_stale = True
+        self.sites_sig.emit([p for p in self._diagram.sites() if p is not None])
+
+    def _draw_edit(self, res : Edit_Result, pos : tuple[int, int]):
+        sites = self._diagram.sites()
+
+        if self._final is None or res.rebuilt:
+            self._origin.fill(self._back_color)
+            pain = QPainter(self._origin)
+            pain.setPen(self._sites_pen)
+            for p in sites:
+                if p is not None: pain.drawPoint(int(p[0]), int(p[1]))
+            pain.end()
+
+            self._final = self._origin.copy()
+            pain = QPainter(self._final)
+            pain.setPen(self._complete_line_pen)
+            for a, b in self._diagram.edges(): pain.drawLine(QLineF(*a, *b))
+            pain.end()
+
+            self._image_label.setPixmap(self._final)
+            return
+
+        # clear the box around the edited site and the old and new edges, then paint back every site and edge
+        # reaching into it. Painting over with the background would also erase unchanged edges crossing there
+        pad = self._sites_pen.width()
+        ends = [p for e in res.removed + res.added for p in e] + [pos]
+        box = QRectF(QPointF(min(p[0] for p in ends), min(p[1] for p in ends)),
+                     QPointF(max(p[0] for p in ends), max(p[1] for p in ends)))
+        box = box.adjusted(-pad, -pad, pad, pad).intersected(QRectF(self._origin.rect()))
+        near = box.adjusted(-pad, -pad, pad, pad)
+        l, t, r, b = near.left(), near.top(), near.right(), near.bottom()
+
+        inside = [p for p in sites if p is not None and l <= p[0] <= r and t <= p[1] <= b]
+        edges = [(p, q) for p, q in self._diagram.edges()
+                 if min(p[0], q[0]) <= r and max(p[0], q[0]) >= l and min(p[1], q[1]) <= b and max(p[1], q[1]) >= t]
+        for pix in (self._origin, self._final):
+            pain = QPainter(pix)
+            pain.setClipRect(box)
+            pain.fillRect(box, self._back_color)
+            pain.setPen(self._sites_pen)
+            for p in inside: pain.drawPoint(int(p[0]), int(p[1]))
+            if pix is self._final:
+                pain.setPen(self._complete_line_pen)
+                for p, q in edges: pain.drawLine(QLineF(*p, *q))
+            pain.end()
+
+        self._image_label.setPixmap(self._final)
+
 class Graph_Frame(QFrame):
     _img_l : QLabel
     _check_b : QCheckBox
@@ -229,18 +551,96 @@ class Graph_Frame(QFrame):
         os.remove(f'{file_name}.png')
 
 
+def parse_sites(text : str) -> np.ndarray:
+    # whitespace or comma separated "x y" pairs, floats are rounded to the pixel
+    a = np.array(text.replace(',', ' ').split(), dtype=np.float64)
+    if len(a) % 2: raise ValueError(f'odd number of coordinates: {len(a)}')
+    if not np.isfinite(a).all(): raise ValueError('coordinates have to be finite')
+    return np.rint(a).astype(np.int64).reshape(-1, 2)
+
+def sort_sites(a : np.ndarray) -> np.ndarray:
+    # by y, then by x
+    return a[np.lexsort((a[:, 0], a[:, 1]))]
+
+
+class Sites_Model(QAbstractTableModel):
+    # table view asks only for visible rows, edits touch one cell
+    _sites : np.ndarray
+
+    def __init__(self):
+        super().__init__()
+        self._sites = np.empty((0, 2), dtype=np.int64)
+
+    def sites(self): return self._sites
+
+    def set_sites(self, a : np.ndarray):
+        self.beginResetModel()
+        self._sites = a
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._sites)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 2
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.EditRole): return int(self._sites[index.row(), index.column()])
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole: return False
+        try: v = int(round(float(value)))
+        except (TypeError, ValueError, OverflowError): return False
+
+        self._sites[index.row(), index.column()] = v
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole: return None
+        if orientation == Qt.Horizontal: return ('x', 'y')[section]
+        return section
+
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemIsEditable
+
+    def insertRows(self, row, count, parent=QModelIndex()):
+        if parent.isValid() or count <= 0 or not 0 <= row <= len(self._sites): return False
+        self.beginInsertRows(parent, row, row + count - 1)
+        self._sites = np.insert(self._sites, row, np.zeros((count, 2), dtype=self._sites.dtype), axis=0)
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if parent.isValid() or count <= 0 or row < 0 or row + count > len(self._sites): return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        self._sites = np.delete(self._sites, np.s_[row:row + count], axis=0)
+        self.endRemoveRows()
+        return True
+
+    def append_sites(self, a : np.ndarray):
+        if not len(a): return
+        self.beginInsertRows(QModelIndex(), len(self._sites), len(self._sites) + len(a) - 1)
+        self._sites = np.concatenate((self._sites, a.astype(self._sites.dtype)))
+        self.endInsertRows()
+
+
 class Main_Window(QMainWindow):
     _img : Image_Area
 
     _width_l : QLineEdit
     _height_l : QLineEdit
     _site_count_l : QLineEdit
+    _distribution_c : QComboBox
+    _seed_l : QLineEdit
 
     _img_splitter: QSplitter
     _graph_sig = pyqtSignal([Beachline])
 
-    _tb : QTextEdit
-    _sites : list[tuple[int, int]]
+    _table : QTableView
+    _model : Sites_Model
+    _sites : np.ndarray  # (n, 2) int
     _triggers : int
     
     def __init__(self):
@@ -249,6 +649,7 @@ class Main_Window(QMainWindow):
         self.setGeometry(150, 150, 1500, 750)
         self.setWindowTitle('Forchun')
         self._triggers = 0
+        self._sites = np.empty((0, 2), dtype=np.int64)
         self.build_face()
 
     def build_face(self):
@@ -265,9 +666,18 @@ class Main_Window(QMainWindow):
         b2.clicked.connect(lambda *args: self._img.draw_all())
         b3 = QPushButton('Previous')
         b3.clicked.connect(lambda *args: self._img.draw_prev())
+        b6 = QPushButton('Cancel')
+        b6.clicked.connect(lambda *args: self._img.cancel_all())
         g1.addWidget(b3, 0, 0)
         g1.addWidget(b1, 0, 1)
-        g1.addWidget(b2, 1, 0, 2, 2)
+        g1.addWidget(b2, 1, 0)
+        g1.addWidget(b6, 1, 1)
+
+        self._img.progress_sig.connect(
+            lambda events, y: self.statusBar().showMessage(f'{events} events, sweep y {y:.0f}'))
+        self._img.preview_sig.connect(
+            lambda shown, total: self.statusBar().showMessage(f'preview {shown} of {total} sites'))
+        self._img.sites_sig.connect(self._sites_edited)
 
         v1.addWidget(self._img)
         v1.addLayout(g1)
@@ -299,6 +709,9 @@ class Main_Window(QMainWindow):
         b4 = QPushButton('Randomize')
         b4.clicked.connect(self._randomize)
 
+        b5 = QPushButton('Import')
+        b5.clicked.connect(self._import_sites)
+
         h2 = QHBoxLayout()
         self._width_l = QLineEdit('800')
         self._width_l.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Fixed)
@@ -320,14 +733,48 @@ class Main_Window(QMainWindow):
         h3.addWidget(self._site_count_l)
         h3.addWidget(l2)
 
-        self._tb = QTextEdit()
+        h4 = QHBoxLayout()
+        self._distribution_c = QComboBox()
+        self._distribution_c.addItems(list(site_generator.DISTRIBUTIONS))
+        self._seed_l = QLineEdit()
+        self._seed_l.setPlaceholderText('seed')
+        self._seed_l.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Fixed)
+        h4.addWidget(self._distribution_c)
+        h4.addWidget(self._seed_l)
+
+        self._model = Sites_Model()
+        self._model.dataChanged.connect(lambda *args: __set_trigger(0))
+        self._model.rowsInserted.connect(self._rows_changed)
+        self._model.rowsRemoved.connect(self._rows_changed)
+
+        self._table = QTableView()
         ff = QFont()
         ff.setPointSize(12)
-        self._tb.setFont(ff)
-        self._tb.textChanged.connect(lambda *args: __set_trigger(0))
+        self._table.setFont(ff)
+        self._table.setModel(self._model)
+        # fixed row height keeps the view from measuring every row
+        self._table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self._table.verticalHeader().setDefaultSectionSize(self._table.fontMetrics().height() + 6)
+        self._table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        QShortcut(QKeySequence.Paste, self._table, self._paste_sites, context=Qt.WidgetShortcut)
+        QShortcut(QKeySequence.Delete, self._table, self._delete_sites, context=Qt.WidgetShortcut)
+
+        h5 = QHBoxLayout()
+        b7 = QPushButton('Add')
+        b7.clicked.connect(self._add_site)
+        b8 = QPushButton('Delete')
+        b8.clicked.connect(self._delete_sites)
+        b9 = QPushButton('Paste')
+        b9.clicked.connect(self._paste_sites)
+        h5.addWidget(b7)
+        h5.addWidget(b8)
+        h5.addWidget(b9)
 
         v2.addWidget(QLabel('Sites (x, y)'))
-        v2.addWidget(self._tb)
+        v2.addWidget(self._table)
+        v2.addLayout(h5)
+        v2.addWidget(b5)
+        v2.addLayout(h4)
         v2.addWidget(b4)
         v2.addLayout(h2)
         v2.addLayout(h3)
@@ -343,10 +790,8 @@ class Main_Window(QMainWindow):
 
         self.setCentralWidget(sp)
 
-    def __update_text(self, a):
-        t = ''
-        for s in a: t += f'{s[0]} {s[1]}\n'
-        self._tb.setText(t)
+    def __update_table(self, a):
+        self._model.set_sites(a)
 
     def __generate_sites(self):
         count = len(self._sites)
@@ -357,43 +802,93 @@ class Main_Window(QMainWindow):
             w = int(self._width_l.text())
             h = int(self._height_l.text())
 
-            for _ in range(n - count): self._sites.append((randint(0, w), randint(0, h)))
+            seed = int(self._seed_l.text()) if self._seed_l.text().strip() else None
+            new = site_generator.generate(self._distribution_c.currentText(), n - count, w, h, seed)
+            self._sites = np.concatenate((self._sites, new))
 
-        self._sites.sort(key=lambda e: e[0])
-        self._sites.sort(key=lambda e: e[1])
+        self._sites = sort_sites(self._sites)
 
     def _randomize(self):
-        self._sites = []
+        self._sites = np.empty((0, 2), dtype=np.int64)
 
         self.__generate_sites()
-        self.__update_text(self._sites)
+        self.__update_table(self._sites)
+
+    def __show_error(self, text : str):
+        d = QErrorMessage()
+        d.showMessage(text)
+        d.exec()
+
+    def __show_count(self, n : int):
+        # the count follows the table, so Update does not generate or drop sites
+        self._site_count_l.blockSignals(True)
+        self._site_count_l.setText(str(n))
+        self._site_count_l.blockSignals(False)
+
+    def _rows_changed(self, *args):
+        self._triggers |= 1
+        self.__show_count(self._model.rowCount())
+
+    def _add_site(self):
+        # below the current row, the new site is edited right away
+        cur = self._table.currentIndex()
+        row = cur.row() + 1 if cur.isValid() else self._model.rowCount()
+        self._model.insertRow(row)
+        index = self._model.index(row, 0)
+        self._table.setCurrentIndex(index)
+        self._table.edit(index)
+
+    def _delete_sites(self):
+        rows = sorted({i.row() for i in self._table.selectionModel().selectedIndexes()}, reverse=True)
+        # contiguous runs from the bottom keep the rows above in place
+        while rows:
+            end = start = rows.pop(0)
+            while rows and rows[0] == start - 1: start = rows.pop(0)
+            self._model.removeRows(start, end - start + 1)
+
+    def _paste_sites(self):
+        text = QApplication.clipboard().text()
+        if not text.strip(): return
+        try: a = parse_sites(text)
+        except ValueError as e:
+            self.__show_error(str(e))
+            return
+        self._model.append_sites(a)
+        self._table.scrollToBottom()
 
-    def _update_sites(self):
-        a = []
-        t = self._tb.toPlainText().splitlines()
+    def _import_sites(self):
+        path, _ = QFileDialog.getOpenFileName(self, 'Import sites', '', 'Text (*.txt *.csv);;All (*)')
+        if not path: return
 
         try:
-            for line in t:
-                sp = line.split(' ')
-                x = int(sp[0])
-                y = int(sp[1])
-                a.append((x, y))
-
+            with open(path) as f: a = parse_sites(f.read())
         except Exception as e:
-            d = QErrorMessage()
-            d.showMessage(str(e))
-            d.exec()
+            self.__show_error(str(e))
             return
 
-        self._sites = a
+        self._sites = sort_sites(a)
+        self._site_count_l.setText(str(len(a)))
+        self.__update_table(self._sites)
+        self._triggers &= ~0b100
+
+    def _update_sites(self):
+        # edits went straight into the model array
+        self._sites = self._model.sites()
         self.__generate_sites()
-        self.__update_text(self._sites)
+        self.__update_table(self._sites)
+
+    def _sites_edited(self, sites : list):
+        self._sites = sort_sites(np.asarray(sites, dtype=np.int64).reshape(-1, 2))
+        self.__update_table(self._sites)
+        self.__show_count(len(self._sites))
 
     def _update_all(self):
         if self._triggers & 1: self._update_sites()
-        if self._triggers & 0b100: self.__generate_sites()
+        if self._triggers & 0b100:
+            self.__generate_sites()
+            self.__update_table(self._sites)
 
-        self._img.set_image(QSize(int(self._width_l.text()), int(self._height_l.text())), self._sites)
+        self._img.set_image(QSize(int(self._width_l.text()), int(self._height_l.text())), self._sites.tolist())
         self._triggers = 0
 
 
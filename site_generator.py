@@ -0,0 +1,177 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+
+def uniform(n : int, width : int, height : int, rng : np.random.Generator):
+    out = rng.random((n, 2))
+    out *= (width, height)
+    return out
+
+def gaussian_clusters(n : int, width : int, height : int, rng : np.random.Generator,
+                      clusters : int = 8, spread : float = 0.05):
+    # spread is the cluster sigma as a part of the smaller side
+    centers = rng.random((clusters, 2)) * (width, height)
+    out = rng.standard_normal((n, 2))
+    out *= spread * min(width, height)
+
+    # contiguous block per cluster instead of a per-point center lookup
+    start = 0
+    for center, count in zip(centers, rng.multinomial(n, np.full(clusters, 1. / clusters))):
+        out[start:start + count] += center
+        start += count
+    return out
+
+def jittered_grid(n : int, width : int, height : int, rng : np.random.Generator, jitter : float = 0.5):
+    # jitter is the displacement as a part of the cell size
+    cols = max(int(np.ceil(np.sqrt(n * width / height))), 1)
+    rows = max(int(np.ceil(n / cols)), 1)
+    cw, ch = width / cols, height / rows
+
+    out = rng.random((n, 2))
+    out -= 0.5
+    out *= (2 * jitter * cw, 2 * jitter * ch)
+    out[:, 0] += np.tile((np.arange(cols) + 0.5) * cw, rows)[:n]
+    out[:, 1] += np.repeat((np.arange(rows) + 0.5) * ch, cols)[:n]
+    return out
+
+def on_curves(n : int, width : int, height : int, rng : np.random.Generator, curves : int = 4, noise : float = 0.005):
+    # circles, sine waves and segments; noise is sigma as a part of the smaller side
+    side = min(width, height)
+    out = rng.standard_normal((n, 2))
+    out *= noise * side
+
+    start = 0
+    for count in rng.multinomial(n, np.full(curves, 1. / curves)):
+        kind = rng.integers(0, 3)
+        cx, cy = rng.random() * width, rng.random() * height
+        size = (0.1 + 0.3 * rng.random()) * side
+        angle = rng.random() * np.pi
+
+        t = rng.random(count)
+        block = out[start:start + count]
+        start += count
+
+        if kind == 0:  # circle
+            t *= 2 * np.pi
+            block[:, 0] += cx + size * np.cos(t)
+            block[:, 1] += cy + size * np.sin(t)
+        elif kind == 1:  # sine wave across the width
+            block[:, 0] += t * width
+            block[:, 1] += cy + 0.5 * size * np.sin(2 * np.pi * (3 * t + angle))
+        else:  # segment through the center
+            t = (t - 0.5) * 2 * size
+            block[:, 0] += cx + t * np.cos(angle)
+            block[:, 1] += cy + t * np.sin(angle)
+
+    return out
+
+def poisson_disk(n : int, width : int, height : int, rng : np.random.Generator,
+                 radius : float = None, attempts : int = 4):
+    # parallel dart throwing on a grid of r / sqrt(2) cells, one point per cell.
+    # Cells three apart are at least sqrt(2) * r away, so the 9 (i % 3, j % 3) phases are filled without conflicts.
+    # Slow: about 2 s per million points, 25 s for 10 million, far from the sub-second of the other kinds.
+    # Every attempt gathers up to 20 neighbour cells per empty cell; use jittered_grid when speed matters
+    if radius is None: radius = np.sqrt(0.54 * width * height / max(n, 1))  # 4 attempts overshoot n in one pass
+
+    while True:
+        out = _poisson_disk(width, height, rng, radius, attempts)
+        if len(out) >= n: break
+        radius *= 0.9
+
+    return out[rng.choice(len(out), n, replace=False)] if len(out) > n else out
+
+def _poisson_disk(width : int, height : int, rng : np.random.Generator, radius : float, attempts : int):
+    cell = radius / np.sqrt(2)
+    gw, gh = int(np.ceil(width / cell)), int(np.ceil(height / cell))
+
+    # x + iy per cell and nan when empty, one gather per neighbour. Padded by 2 cells so neighbour lookups
+    # never leave the array
+    stride = gw + 4
+    p = np.full((gh + 4) * stride, np.nan, dtype=np.complex128)
+    # corner cells of the 5x5 block are at least r away; nearest cells reject most, check them first
+    offsets = sorted(((dy, dx) for dy in range(-2, 3) for dx in range(-2, 3)
+                      if (dy, dx) != (0, 0) and abs(dy) + abs(dx) < 4), key=lambda o: abs(o[0]) + abs(o[1]))
+    offsets = [dy * stride + dx for dy, dx in offsets]
+    r2 = radius * radius
+
+    phases = []
+    for phase_y in range(3):
+        for phase_x in range(3):
+            cy, cx = np.meshgrid(np.arange(phase_y, gh, 3), np.arange(phase_x, gw, 3), indexing='ij')
+            phases.append((cy.ravel() + 2) * stride + cx.ravel() + 2)
+
+    placed = False
+    for _ in range(attempts):
+        for i, idx in enumerate(phases):
+            if placed:
+                idx = phases[i] = idx[np.isnan(p[idx].real)]
+            if not len(idx): continue
+
+            cy, cx = np.divmod(idx, stride)
+            c = (cx - 2 + rng.random(len(idx))) * cell + 1j * ((cy - 2 + rng.random(len(idx))) * cell)
+            ok = (c.real < width) & (c.imag < height)
+            c, idx = c[ok], idx[ok]
+
+            # the very first phase has nothing to collide with
+            if placed:
+                ok = np.ones(len(idx), dtype=bool)
+                for k, off in enumerate(offsets):
+                    d = p[idx + off] - c
+                    # nan compares false, empty cells never reject
+                    ok &= ~(d.real * d.real + d.imag * d.imag < r2)
+                    if k % 2 == 1 or k == len(offsets) - 1:
+                        c, idx = c[ok], idx[ok]
+                        ok = np.ones(len(idx), dtype=bool)
+
+            p[idx] = c
+            placed = True
+
+    p = p[~np.isnan(p.real)]
+    return np.column_stack((p.real, p.imag))
+
+
+DISTRIBUTIONS = {
+    'uniform': uniform,
+    'clusters': gaussian_clusters,
+    'poisson': poisson_disk,
+    'jittered_grid': jittered_grid,
+    'curves': on_curves,
+}
+
+
+def generate(kind : str, n : int, width : int, height : int, seed : int = None,
+             integer : bool = True, **params) -> np.ndarray:
+    # (n, 2) sites clipped to [0, width] x [0, height], the same seed gives the same sites
+    rng = np.random.default_rng(seed)
+    out = DISTRIBUTIONS[kind](n, width, height, rng, **params)
+
+    np.clip(out, 0, (width, height), out=out)
+    if integer:
+        out += 0.5  # non negative after the clip, truncation rounds
+        return out.astype(np.int64)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seeded site generator, writes "x y" lines')
+    parser.add_argument('kind', choices=list(DISTRIBUTIONS))
+    parser.add_argument('-n', type=int, default=1000)
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--float', action='store_true', help='keep float coordinates')
+    parser.add_argument('-o', '--output', default=None, help='file, stdout by default')
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    a = generate(args.kind, args.n, args.width, args.height, args.seed, not args.float)
+    print(f'{args.kind}: {len(a)} sites in {(time.perf_counter() - t) * 1e3:.1f} ms', file=sys.stderr)
+
+    np.savetxt(args.output if args.output else sys.stdout, a, fmt='%g' if args.float else '%d')
+
+
+if __name__ == "__main__":
+    main()
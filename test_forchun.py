@@ -0,0 +1,26 @@
+import numpy as np
+
+from forchun import Forchun
+import site_generator
+
+
+def _grid(side : int, step : int) -> list:
+    gx, gy = np.meshgrid(np.arange(side) * step, np.arange(side) * step)
+    return np.column_stack((gx.ravel(), gy.ravel())).tolist()
+
+
+def test_cocircular_grid_keeps_circle_events():
+    # every grid cell has four cocircular sites, removing one arc must not replace its neighbours' events
+    f = Forchun(_grid(30, 20), 800)
+    f.all_steps()
+    created, invalidated = f.circle_event_stats()
+    assert invalidated == 0
+    assert created == len(f._vertices) == 2 * 29 * 29
+
+
+def test_circle_events_on_seeded_sites():
+    f = Forchun(site_generator.generate('uniform', 2000, 800, 600, 0).tolist(), 800)
+    f.all_steps()
+    created, invalidated = f.circle_event_stats()
+    assert created - invalidated == len(f._vertices)
+    assert invalidated < created / 2
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from forchun import Forchun
+from forchun_server import Diagram_Index, Forchun_Client, Forchun_Server
+import site_generator
+
+
+@pytest.fixture
+def server():
+    # TCP server on a free port, run by a loop on its own thread
+    f = Forchun(site_generator.generate('uniform', 200, 800, 600, 0).tolist(), 800)
+    srv = Forchun_Server(Diagram_Index.from_forchun(f))
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    tcp = asyncio.run_coroutine_threadsafe(srv.serve(), loop).result(10)
+    yield srv, tcp.sockets[0].getsockname()[1]
+
+    loop.call_soon_threadsafe(tcp.close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+
+
+def test_bad_request_keeps_connection(server):
+    srv, port = server
+    with Forchun_Client(port=port) as c:
+        with pytest.raises(ValueError, match='unknown site'): c.neighbors([10 ** 6])
+        assert len(c.neighbors([0])[0]) > 0
+
+        srv.index.sites = lambda ids: np.empty(0)[ids]
+        with pytest.raises(ValueError, match='IndexError'): c.sites([5])
+        ids, _ = c.locate([[400., 300.]])
+        assert 0 <= ids[0] < len(srv.index.pts)
+
+
+def test_neighbors_of_no_ids(server):
+    _, port = server
+    with Forchun_Client(port=port) as c:
+        assert c.neighbors([]) == []
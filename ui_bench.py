@@ -0,0 +1,156 @@
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QMouseEvent
+from PyQt5.QtCore import Qt, QSize, QPointF, QEvent
+
+from main_window import Main_Window
+import site_generator
+
+PARTS = ['sweep', 'forchun draw', 'paint', 'graph', 'present', 'frame']
+
+
+class Frame_Timer:
+    # wraps the per frame calls of one Image_Area, times in seconds per frame and part
+    _img = None
+    _frame : dict
+
+    frames : list[dict]
+
+    def __init__(self, img):
+        self._img = img
+        self.frames = []
+        self._frame = {}
+
+        timer = self
+
+        class _Graph_Signal:
+            def __init__(self, sig): self._sig = sig
+
+            def emit(self, tree):
+                t = time.perf_counter()
+                self._sig.emit(tree)
+                timer._add('graph', time.perf_counter() - t)
+
+        img._graph_sig = _Graph_Signal(img._graph_sig)
+        img._draw = self._wrap(img._draw, 'paint')
+
+    def attach(self, forch):
+        # call after every set_image, draw_by includes Forchun.draw, the sweep part is the difference
+        forch.draw_by = self._wrap(forch.draw_by, 'sweep')
+        forch.draw = self._wrap(forch.draw, 'forchun draw')
+
+    def _wrap(self, fn, part : str):
+        def _timed(*args, **kwargs):
+            t = time.perf_counter()
+            res = fn(*args, **kwargs)
+            self._add(part, time.perf_counter() - t)
+            return res
+        return _timed
+
+    def _add(self, part : str, t : float):
+        self._frame[part] = self._frame.get(part, 0.) + t
+
+    def start(self):
+        self._frame = {}
+
+    def finish(self, present : float, total : float):
+        f = self._frame
+        # nested timings: draw_by holds Forchun.draw, _draw holds the graph update
+        f['sweep'] = f.get('sweep', 0.) - f.get('forchun draw', 0.)
+        f['paint'] = f.get('paint', 0.) - f.get('graph', 0.)
+        f['present'] = present
+        f['frame'] = total
+        self.frames.append(f)
+
+
+def mouse_path(pattern : str, height : int, step : int, rng : np.random.Generator) -> list[int]:
+    down = list(range(0, height, step))
+    if pattern == 'down': return down
+    if pattern == 'up': return down[::-1]
+    if pattern == 'zigzag':
+        # small moves back and forth around a drifting center
+        center = np.linspace(height * 0.1, height * 0.9, len(down))
+        return np.clip(center + rng.normal(0., 4 * step, len(down)), 0, height - 1).astype(int).tolist()
+    raise ValueError(f'unknown pattern {pattern}')
+
+PATTERNS = ['down', 'up', 'zigzag']
+
+
+def run(app : QApplication, window : Main_Window, sites : list, width : int, height : int,
+        patterns : list[str], step : int, seed : int) -> dict[str, list[dict]]:
+    img = window._img
+    timer = Frame_Timer(img)
+    label = img._image_label
+    rng = np.random.default_rng(seed)
+
+    out = {}
+    for pattern in patterns:
+        img.set_image(QSize(width, height), sites)
+        # large sets come up coarse to fine, frames start on the finished diagram
+        while img.is_running():
+            app.processEvents()
+            time.sleep(0.01)
+        timer.attach(img.forch)
+        app.processEvents()
+        timer.frames = []
+
+        for y in mouse_path(pattern, height, step, rng):
+            e = QMouseEvent(QEvent.MouseMove, QPointF(width / 2, y), Qt.NoButton, Qt.NoButton, Qt.NoModifier)
+            timer.start()
+            t = time.perf_counter()
+            QApplication.sendEvent(label, e)
+            t_present = time.perf_counter()
+            app.processEvents()
+            end = time.perf_counter()
+            timer.finish(end - t_present, end - t)
+
+        out[pattern] = timer.frames
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offscreen frame times of mouse sweeps over the image')
+    parser.add_argument('-n', type=int, nargs='*', default=[10, 100, 1000, 3000])
+    parser.add_argument('-p', '--pattern', choices=PATTERNS, nargs='*', default=PATTERNS)
+    parser.add_argument('-d', '--distribution', choices=list(site_generator.DISTRIBUTIONS), default='uniform')
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--step', type=int, default=8, help='mouse move in pixels between frames')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--graph', action='store_true', help='enable the beachline graph, needs Graphviz')
+    parser.add_argument('-o', '--output', default=None, help='csv of every frame')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    window = Main_Window()
+    window.show()
+    window._img_splitter.widget(0)._check_b.setChecked(args.graph)
+
+    rows = []
+    print(f'{"n":>6} {"pattern":<8} {"part":<13} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+    for n in args.n:
+        sites = site_generator.generate(args.distribution, n, args.width, args.height, args.seed).tolist()
+        res = run(app, window, sites, args.width, args.height, args.pattern, args.step, args.seed)
+
+        for pattern, frames in res.items():
+            for i, f in enumerate(frames): rows.append((n, pattern, i, *(f.get(p, 0.) for p in PARTS)))
+            for part in PARTS:
+                t = np.array([f.get(part, 0.) for f in frames]) * 1e3
+                p50, p95, p99 = np.percentile(t, (50, 95, 99))
+                print(f'{n:>6} {pattern:<8} {part:<13} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {t.max():>8.2f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write('n,pattern,frame,' + ','.join(p.replace(' ', '_') for p in PARTS) + '\n')
+            for r in rows: f.write(f'{r[0]},{r[1]},{r[2]},' + ','.join(f'{t:.6f}' for t in r[3:]) + '\n')
+
+
+if __name__ == "__main__":
+    main()